@@ -0,0 +1,285 @@
+import argparse
+import os
+import subprocess
+
+import numpy as np
+
+# Single-pass parser of EyeLink ASC files
+#
+# The EDF of a session is converted to ASC text (edf2asc) and read in
+# fixed-size chunks. Sample lines, which are nearly all of a 1000 Hz
+# recording, are never looked at in Python: the line starts of a chunk are
+# found with NumPy, the sample lines are cut out as one block of bytes and
+# handed to NumPy's C text parser in one go. Only the (few) MSG, EFIX and
+# ESACC lines are parsed one by one.
+#
+# The result is a set of column tables (dicts of NumPy arrays), one per
+# event type: trials, trial_vars, messages, fixations, saccades and
+# samples. Every row carries the TRIALID of the trial it belongs to, -1
+# outside of trials.
+
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# a lone '.' is a missing value in the ASC files; numbers never have a
+# blank right before their decimal point, so these only match missing values
+MISSING = ((b'\t.\t', b'\tnan\t'), (b' .\t', b' nan\t'), (b' .\n', b' nan\n'))
+
+# columns kept from the sample lines: time, x, y, pupil (of the first eye)
+SAMPLE_COLUMNS = (0, 1, 2, 3)
+
+
+def _num(token):
+    return np.nan if token == '.' else float(token)
+
+
+def asc_path(path):
+    """ return the path of the ASC text of a data file
+
+    EDF files are converted with edf2asc next to the EDF, unless the file
+    is already text (e.g., written by trackersim)
+    """
+
+    with open(path, 'rb') as f:
+        head = f.read(64)
+    if head.startswith(b'**') or b'\0' not in head:
+        return path
+    out = os.path.splitext(path)[0] + '.asc'
+    if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path):
+        try:
+            subprocess.run(['edf2asc', '-y', path, out], check=True,
+                           stdout=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError) as err:
+            raise RuntimeError('cannot convert %s with edf2asc: %s'
+                               % (path, err))
+    return out
+
+
+class AscData(object):
+    """ the tables of a parsed ASC file
+
+    trials: trial, start (TRIALID time), onset (image_onset time), end
+            (TRIAL_RESULT time) and result; -1 where a message is missing
+    trial_vars: trial, name, value of the !V TRIAL_VAR messages
+    messages: trial, time, text of every MSG line
+    fixations: trial, eye, start, end, duration, x, y, pupil
+    saccades: trial, eye, start, end, duration, x0, y0, x1, y1, amplitude,
+              peak_velocity
+    samples: trial, time, x, y, pupil
+    """
+
+    TABLES = ('trials', 'trial_vars', 'messages', 'fixations', 'saccades',
+              'samples')
+
+    def __init__(self, tables):
+        for name in self.TABLES:
+            setattr(self, name, tables[name])
+
+    def save(self, path):
+        """ save the tables to a .npz file """
+
+        arrays = {}
+        for name in self.TABLES:
+            for column, values in getattr(self, name).items():
+                arrays['%s.%s' % (name, column)] = values
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """ load tables saved with save() """
+
+        tables = dict((name, {}) for name in cls.TABLES)
+        with np.load(path) as data:
+            for key in data.files:
+                name, column = key.split('.', 1)
+                tables[name][column] = data[key]
+        return cls(tables)
+
+
+class _Parser(object):
+
+    def __init__(self, sample_columns):
+        self.sample_columns = sample_columns
+        self.trial = -1
+        self.trials = []
+        self.trial_vars = []
+        self.messages = []
+        self.fixations = []
+        self.saccades = []
+        self.sample_blocks = []
+
+    def feed(self, chunk):
+        """ parse a chunk of whole lines (ending with a newline) """
+
+        buf = np.frombuffer(chunk, dtype=np.uint8)
+        ends = np.flatnonzero(buf == ord('\n'))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        first = buf[starts]
+        is_sample = (first >= ord('0')) & (first <= ord('9'))
+
+        # the event lines, in file order
+        is_event = (first == ord('M')) | (first == ord('E'))
+        for i in np.flatnonzero(is_event):
+            self._event(chunk[starts[i]:ends[i]].decode('ascii', 'replace'))
+
+        if is_sample.any():
+            keep = np.repeat(is_sample, ends - starts + 1)
+            data = buf[keep].tobytes()
+            for missing, nan in MISSING:
+                data = data.replace(missing, nan)
+            block = np.loadtxt(data.splitlines(), usecols=self.sample_columns,
+                               ndmin=2)
+            self.sample_blocks.append(block)
+
+    def _event(self, line):
+        if line.startswith('MSG'):
+            fields = line.split(None, 2)
+            t = int(fields[1])
+            text = fields[2].strip() if len(fields) > 2 else ''
+            # edf2asc keeps the time the message was received and writes
+            # the offset it was sent with in front of it, negated
+            # ("MSG 1003 -5 text" happened at 998)
+            head, sep, rest = text.partition(' ')
+            if sep and head.lstrip('-').isdigit():
+                t += int(head)
+                text = rest
+            self._message(t, text)
+        elif line.startswith('EFIX'):
+            f = line.split()
+            self.fixations.append((self.trial, f[1], int(f[2]), int(f[3]),
+                                   int(f[4]), _num(f[5]), _num(f[6]),
+                                   _num(f[7]) if len(f) > 7 else np.nan))
+        elif line.startswith('ESACC'):
+            f = line.split()
+            values = [_num(v) for v in f[5:11]]
+            values += [np.nan] * (6 - len(values))
+            self.saccades.append((self.trial, f[1], int(f[2]), int(f[3]),
+                                  int(f[4])) + tuple(values))
+
+    def _message(self, t, text):
+        if text.startswith('TRIALID'):
+            fields = text.split()
+            try:
+                self.trial = int(fields[1])
+            except (IndexError, ValueError):
+                self.trial = len(self.trials) + 1
+            self.trials.append([self.trial, t, -1, -1, -1])
+        # the TRIALID message belongs to the trial it starts, like the
+        # samples from its time on
+        self.messages.append((self.trial, t, text))
+        if text.startswith('TRIALID') or self.trial < 0:
+            return
+        if text == 'image_onset':
+            if self.trials[-1][2] < 0:
+                self.trials[-1][2] = t
+        elif text.startswith('!V TRIAL_VAR'):
+            fields = text.split(None, 3)
+            if len(fields) >= 3:
+                value = fields[3] if len(fields) > 3 else ''
+                self.trial_vars.append((self.trial, fields[2], value))
+        elif text.startswith('TRIAL_RESULT'):
+            fields = text.split()
+            self.trials[-1][3] = t
+            self.trials[-1][4] = int(fields[1]) if len(fields) > 1 else 0
+            self.trial = -1
+
+    def tables(self):
+        def columns(rows, names, dtypes):
+            table = {}
+            for i, (name, dtype) in enumerate(zip(names, dtypes)):
+                table[name] = np.array([row[i] for row in rows], dtype=dtype)
+            return table
+
+        trials = columns(self.trials,
+                         ('trial', 'start', 'onset', 'end', 'result'),
+                         ('i4', 'i8', 'i8', 'i8', 'i4'))
+        tables = {
+            'trials': trials,
+            'trial_vars': columns(self.trial_vars, ('trial', 'name', 'value'),
+                                  ('i4', 'U', 'U')),
+            'messages': columns(self.messages, ('trial', 'time', 'text'),
+                                ('i4', 'i8', 'U')),
+            'fixations': columns(
+                self.fixations,
+                ('trial', 'eye', 'start', 'end', 'duration', 'x', 'y',
+                 'pupil'),
+                ('i4', 'U1', 'i8', 'i8', 'i4', 'f4', 'f4', 'f4')),
+            'saccades': columns(
+                self.saccades,
+                ('trial', 'eye', 'start', 'end', 'duration', 'x0', 'y0',
+                 'x1', 'y1', 'amplitude', 'peak_velocity'),
+                ('i4', 'U1', 'i8', 'i8', 'i4', 'f4', 'f4', 'f4', 'f4', 'f4',
+                 'f4')),
+            }
+
+        if self.sample_blocks:
+            block = np.concatenate(self.sample_blocks)
+        else:
+            block = np.zeros((0, len(self.sample_columns)))
+        time = block[:, 0].astype('i8')
+        tables['samples'] = {
+            'trial': sample_trials(time, trials),
+            'time': time,
+            'x': block[:, 1].astype('f4'),
+            'y': block[:, 2].astype('f4'),
+            'pupil': block[:, 3].astype('f4'),
+            }
+        return tables
+
+
+def sample_trials(time, trials):
+    """ return the trial of each sample time, -1 outside of the trials """
+
+    result = np.full(len(time), -1, dtype='i4')
+    if len(trials['trial']) == 0:
+        return result
+    i = np.searchsorted(trials['start'], time, side='right') - 1
+    inside = i >= 0
+    ends = trials['end'][np.maximum(i, 0)]
+    # a trial without TRIAL_RESULT runs until the next one starts
+    inside &= (ends < 0) | (time <= ends)
+    result[inside] = trials['trial'][i[inside]]
+    return result
+
+
+def parse_asc(path, chunk_bytes=CHUNK_BYTES, sample_columns=SAMPLE_COLUMNS):
+    """ parse an ASC (or EDF) file into an AscData
+
+    chunk_bytes: how much of the file is read at once
+    sample_columns: the columns of the sample lines to keep, as time, x, y,
+                    pupil; e.g., (0, 4, 5, 6) for the right eye of a
+                    binocular recording
+    """
+
+    parser = _Parser(sample_columns)
+    rest = b''
+    with open(asc_path(path), 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            data = rest + chunk
+            # the partial line at the end goes with the next chunk
+            cut = data.rfind(b'\n') + 1
+            if cut:
+                parser.feed(data[:cut])
+            rest = data[cut:]
+    if rest.strip():
+        parser.feed(rest + b'\n')
+    return AscData(parser.tables())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Parse an EyeLink ASC/EDF file into column tables')
+    parser.add_argument('path', help='the ASC or EDF file')
+    parser.add_argument('--out', default=None,
+                        help='save the tables to this .npz file')
+    args = parser.parse_args()
+
+    data = parse_asc(args.path)
+    for name in AscData.TABLES:
+        table = getattr(data, name)
+        n = len(next(iter(table.values()))) if table else 0
+        print('%-10s %9d rows  %s' % (name, n, ', '.join(table)))
+    if args.out is not None:
+        data.save(args.out)
@@ -0,0 +1,41 @@
+import pygame
+
+# Host PC backdrop pixels for bitmapBackdrop()
+#
+# bitmapBackdrop() wants the image as rows of (R, G, B) tuples. Reading them
+# with get_at() costs a Python call per pixel; here the pixels are copied out
+# in bulk with pygame.image.tostring(), downsampled to the resolution of the
+# Host display.
+
+
+def fit_size(size, max_size):
+    """ return size scaled down to fit in max_size, keeping its aspect ratio """
+
+    w, h = size
+    max_w, max_h = max_size
+    scale = min(1.0, max_w / w, max_h / h)
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def rgb_rows(data, width, height):
+    """ split packed RGB bytes into rows of (r, g, b) tuples """
+
+    row = 3 * width
+    return [list(zip(data[o:o + row:3], data[o + 1:o + row:3],
+                     data[o + 2:o + row:3]))
+            for o in range(0, row * height, row)]
+
+
+def host_backdrop(surf, host_size=None):
+    """ return surf downsampled to fit the Host display
+
+    host_size: (width, height) of the Host display, None to keep the full
+               resolution
+    """
+
+    if host_size is not None:
+        size = fit_size(surf.get_size(), host_size)
+        if size != surf.get_size():
+            surf = pygame.transform.smoothscale(surf, size)
+    return surf
+
@@ -0,0 +1,290 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ascparse import parse_asc
+
+# Study-wide analysis of the session folders
+#
+# Every results/<session> folder is analysed on its own, in a process pool:
+# its EDF (through ascparse) and its <session>_results.jsonl trial log are
+# reduced to one row per trial (RT, accuracy, time to the first fixation on
+# the target and scanpath metrics), then the rows of all sessions are
+# merged into a single CSV.
+#
+# The rows of each session are cached in results/.analysis/. A session is
+# analysed again only if one of its files changed: a file whose mtime/size
+# changed but whose content hash did not keeps the cached rows.
+
+# bump when the rows change, to drop the cached results
+ANALYSIS_VERSION = 1
+
+COLUMNS = ('session', 'trial', 'image', 'rt', 'hit', 'timeout',
+           'ttff_online', 'ttff', 'n_fixations', 'mean_fixation_ms',
+           'scanpath_px', 'mean_saccade_px', 'fixations_before_target')
+
+DATA_PATTERNS = ('*.EDF', '*.edf', '*.asc', '*_results.jsonl')
+
+
+def session_files(folder):
+    """ return the data files of a session folder
+
+    an .asc file next to its EDF is left out, the analysis converts the
+    EDF into it (see ascparse.asc_path)
+    """
+
+    files = set()
+    for pattern in DATA_PATTERNS:
+        files.update(glob.glob(os.path.join(folder, pattern)))
+    for path in list(files):
+        base, ext = os.path.splitext(path)
+        if ext == '.asc' and \
+                (base + '.EDF' in files or base + '.edf' in files):
+            files.discard(path)
+    return sorted(files)
+
+
+def file_stamps(files):
+    """ return {name: [mtime_ns, size]} of files """
+
+    stamps = {}
+    for path in files:
+        st = os.stat(path)
+        stamps[os.path.basename(path)] = [st.st_mtime_ns, st.st_size]
+    return stamps
+
+
+def file_hash(path):
+    """ return the SHA-1 of the content of a file """
+
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_trial_log(path):
+    """ return {trial: record} of the trial records of a results log """
+
+    trials = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last line of a crashed session may be cut short
+                continue
+            if record.get('type') == 'trial':
+                trials[record['trial']] = record
+    return trials
+
+
+def interest_areas(messages, trial):
+    """ return the target rectangle and polygons of a trial's IAREA messages """
+
+    rect = None
+    polygons = []
+    for text in messages['text'][messages['trial'] == trial]:
+        if text.startswith('!V IAREA RECTANGLE'):
+            fields = text.split()
+            rect = tuple(int(v) for v in fields[4:8])
+        elif text.startswith('!V IAREA FREEHAND'):
+            points = [p.split(',') for p in text.split()[4:] if ',' in p]
+            polygons.append(np.array(points, dtype=float))
+    return rect, polygons
+
+
+def in_polygon(x, y, poly):
+    """ return which of the points (x, y arrays) are inside a polygon """
+
+    inside = np.zeros(len(x), dtype=bool)
+    x0, y0 = poly[-1]
+    for x1, y1 in poly:
+        crosses = (y0 > y) != (y1 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (x < xc)
+        x0, y0 = x1, y1
+    return inside
+
+
+def on_target(x, y, rect, polygons):
+    """ return which of the points (x, y arrays) are on the target """
+
+    if rect is None:
+        return np.zeros(len(x), dtype=bool)
+    left, top, right, bottom = rect
+    hit = (x >= left) & (x < right) & (y >= top) & (y < bottom)
+    if polygons:
+        in_any = np.zeros(len(x), dtype=bool)
+        for poly in polygons:
+            in_any |= in_polygon(x, y, poly)
+        hit &= in_any
+    return hit
+
+
+def gaze_metrics(data, trial, onset):
+    """ return the fixation metrics of a trial from its ASC tables """
+
+    fix = data.fixations
+    sel = (fix['trial'] == trial) & (fix['end'] > onset)
+    start = np.maximum(fix['start'][sel], onset)
+    x = fix['x'][sel].astype(float)
+    y = fix['y'][sel].astype(float)
+    duration = fix['end'][sel] - start
+
+    rect, polygons = interest_areas(data.messages, trial)
+    hits = np.flatnonzero(on_target(x, y, rect, polygons))
+    steps = np.hypot(np.diff(x), np.diff(y))
+    metrics = {
+        'ttff': int(start[hits[0]] - onset) if len(hits) else None,
+        'fixations_before_target': int(hits[0]) if len(hits) else None,
+        'n_fixations': int(sel.sum()),
+        'mean_fixation_ms': float(duration.mean()) if len(duration) else None,
+        'scanpath_px': float(np.nansum(steps)),
+        'mean_saccade_px': float(np.nanmean(steps)) if len(steps) else None,
+        }
+    return metrics
+
+
+def analyze_session(folder):
+    """ return the per-trial rows of a session folder """
+
+    session = os.path.basename(os.path.normpath(folder))
+    rows = {}
+
+    for path in glob.glob(os.path.join(folder, '*_results.jsonl')):
+        for trial, record in read_trial_log(path).items():
+            rows[trial] = {
+                'session': session, 'trial': trial,
+                'image': record.get('image'), 'rt': record.get('rt'),
+                'hit': record.get('hit'), 'timeout': record.get('timeout'),
+                'ttff_online': record.get('ttff'),
+                }
+
+    edfs = [p for p in session_files(folder)
+            if not p.endswith('_results.jsonl')]
+    for path in edfs:
+        try:
+            data = parse_asc(path)
+        except RuntimeError as err:
+            print('ERROR: %s' % err)
+            continue
+        trial_vars = {}
+        for trial, name, value in zip(data.trial_vars['trial'],
+                                      data.trial_vars['name'],
+                                      data.trial_vars['value']):
+            trial_vars.setdefault(int(trial), {})[name] = value
+        for trial, start, onset in zip(data.trials['trial'],
+                                       data.trials['start'],
+                                       data.trials['onset']):
+            trial = int(trial)
+            row = rows.setdefault(trial, {'session': session, 'trial': trial})
+            tvars = trial_vars.get(trial, {})
+            if row.get('image') is None and 'image' in tvars:
+                row['image'] = tvars['image']
+            if row.get('rt') is None and 'RT' in tvars:
+                row['rt'] = float(tvars['RT']) / 1000.0
+            if row.get('hit') is None and 'hit' in tvars:
+                row['hit'] = tvars['hit'] == '1'
+            onset = int(onset) if onset >= 0 else int(start)
+            row.update(gaze_metrics(data, trial, onset))
+
+    return [rows[trial] for trial in sorted(rows)]
+
+
+def _analyze(folder, cached):
+    """ worker: analyse a session unless its content matches the cache """
+
+    files = session_files(folder)
+    hashes = dict((os.path.basename(p), file_hash(p)) for p in files)
+    if cached is not None and cached.get('hashes') == hashes:
+        rows = cached['rows']
+    else:
+        rows = analyze_session(folder)
+    return {'version': ANALYSIS_VERSION, 'stamps': file_stamps(files),
+            'hashes': hashes, 'rows': rows}
+
+
+def find_sessions(results_dir):
+    """ return the session folders of a results folder """
+
+    folders = []
+    for name in sorted(os.listdir(results_dir)):
+        path = os.path.join(results_dir, name)
+        if not name.startswith('.') and os.path.isdir(path) and \
+                session_files(path):
+            folders.append(path)
+    return folders
+
+
+def run(results_dir, out_path, workers=None):
+    """ analyse every session of results_dir and write the merged rows
+
+    returns the number of sessions that had to be analysed
+    """
+
+    cache_dir = os.path.join(results_dir, '.analysis')
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    results = {}
+    pending = {}
+    for folder in find_sessions(results_dir):
+        cache_path = os.path.join(cache_dir,
+                                  os.path.basename(folder) + '.json')
+        cached = None
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('version') != ANALYSIS_VERSION:
+                cached = None
+        if cached is not None and \
+                cached['stamps'] == file_stamps(session_files(folder)):
+            results[folder] = cached
+        else:
+            pending[folder] = (cache_path, cached)
+
+    if pending:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = dict((folder, pool.submit(_analyze, folder, cached))
+                           for folder, (cache_path, cached) in pending.items())
+            for folder, future in futures.items():
+                result = future.result()
+                cache_path = pending[folder][0]
+                with open(cache_path + '.tmp', 'w') as f:
+                    json.dump(result, f)
+                os.replace(cache_path + '.tmp', cache_path)
+                results[folder] = result
+                print('Analysed %s (%d trials)'
+                      % (os.path.basename(folder), len(result['rows'])))
+
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for folder in sorted(results):
+            writer.writerows(results[folder]['rows'])
+    return len(pending)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Analyse every session folder and merge the trials')
+    parser.add_argument('results_dir', nargs='?', default='results',
+                        help='folder holding the session folders')
+    parser.add_argument('--out', default=None,
+                        help='CSV to write, <results_dir>/study.csv by default')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    args = parser.parse_args()
+
+    out_path = args.out or os.path.join(args.results_dir, 'study.csv')
+    n = run(args.results_dir, out_path, args.workers)
+    print('%d session(s) analysed, trials written to %s' % (n, out_path))
@@ -0,0 +1,116 @@
+import json
+import os
+
+# Crash-safe checkpoint of a session
+#
+# After every trial the progress of the session is written to
+# <session>_checkpoint.json in the session folder: the position in the
+# trial schedule, the outcome of each trial run so far, the trials that
+# failed (e.g., the recording did not start), the seed the trial order was
+# drawn from, and the EDF segments recorded. The file is written
+# to a temporary file, fsync()-ed and renamed over the previous one, so a
+# crash leaves either the old or the new checkpoint, never half of one.
+#
+# "--resume <session_identifier>" continues a session that stopped: it
+# reads the checkpoint and the schedule from the session folder and runs
+# the failed trials again, then the trials left, recording them into a new
+# EDF segment (the Host PC file of the first one cannot be appended to).
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_SUFFIX = '_checkpoint.json'
+
+
+def segment_edf_name(edf_fname, segment):
+    """ return the Host PC EDF filename (up to 8 characters) of a segment
+    of a session, e.g., SUBJ0001, 2 -> SUBJ00_2
+    """
+
+    if segment == 1:
+        return edf_fname
+    suffix = '_%d' % segment
+    return edf_fname[:8 - len(suffix)] + suffix
+
+
+class Checkpoint(object):
+    """ progress of a session, saved after every trial
+
+    path: the checkpoint file
+    session_identifier: the session the checkpoint belongs to
+    seed: the seed of the trial schedule
+    """
+
+    def __init__(self, path, session_identifier, seed=None):
+        self.path = path
+        self.session_identifier = session_identifier
+        self.seed = seed
+        # the position in the schedule of the next trial to run (from 0)
+        self.next_trial = 0
+        # the positions ('trial', from 1) of the trials to run again
+        self.failed = []
+        self.results = []
+        self.segments = []
+
+    def trials_left(self, schedule):
+        """ return the schedule entries still to run: the failed trials,
+        then the trials after the last one run
+        """
+
+        return ([schedule.trials[pos - 1] for pos in self.failed] +
+                schedule.trials[self.next_trial:])
+
+    def start_segment(self, edf_file, local_name):
+        """ record a new EDF file, starting at the next trial """
+
+        self.segments.append({'edf_file': edf_file, 'local_name': local_name,
+                              'first_trial': min(self.failed +
+                                                 [self.next_trial + 1])})
+        self.save()
+
+    def trial_done(self, trial, result):
+        """ record the outcome of a trial of the schedule and save
+
+        trial: the schedule entry of the trial
+        result: dict of the outcome of the trial, None if the trial failed
+                and must be run again
+        """
+
+        pos = trial['trial']
+        if pos in self.failed:
+            self.failed.remove(pos)
+        if result is None:
+            self.failed.append(pos)
+        else:
+            record = {'trial': pos}
+            record.update(result)
+            self.results.append(record)
+        self.next_trial = max(self.next_trial, pos)
+        self.save()
+
+    def save(self):
+        data = {'version': CHECKPOINT_VERSION,
+                'session_identifier': self.session_identifier,
+                'next_trial': self.next_trial, 'failed': self.failed,
+                'seed': self.seed, 'segments': self.segments,
+                'results': self.results}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    @classmethod
+    def load(cls, path):
+        """ read a checkpoint written by save() """
+
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != CHECKPOINT_VERSION:
+            raise ValueError('%s is not a version %d session checkpoint'
+                             % (path, CHECKPOINT_VERSION))
+        checkpoint = cls(path, data['session_identifier'], data['seed'])
+        checkpoint.next_trial = data['next_trial']
+        checkpoint.failed = data['failed']
+        checkpoint.results = data['results']
+        checkpoint.segments = data['segments']
+        return checkpoint
@@ -3,7 +3,8 @@ import sys
 import time
 import os #for path handling
 import random
-import PIL
+from responses import ABORT, CLICK, TIMEOUT, wait_response
+from resultslog import ResultsLog
 
 
 # Get the directory where the current script is located
@@ -15,8 +16,8 @@ STIMULI_DIR = os.path.join(MEDIA_DIR, "stimuli")
 MASK_DIR = os.path.join(MEDIA_DIR, "gt")
 
 
-#initialise pygame
-pygame.init()
+#initialise pygame, only the display (and its events) is used
+pygame.display.init()
 screen = pygame.display.set_mode((1280, 1080))
 pygame.display.set_caption("Object Search Game")
 screen_rect = screen.get_rect()
@@ -56,6 +57,14 @@ image3, image3_rect = load_centered_image(os.path.join(BACKGROUND_DIR, "image3.p
 reaction_times = []
 NUM_TRIALS = 240
 
+# clicks and trial outcomes are streamed to a results log, so nothing is
+# lost if the game stops halfway
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+if not os.path.exists(RESULTS_DIR):
+    os.makedirs(RESULTS_DIR)
+results_log = ResultsLog(os.path.join(
+    RESULTS_DIR, time.strftime("datapygame_%Y_%m_%d_%H_%M.jsonl")))
+
 running = True
 game_over = False
 
@@ -74,11 +83,13 @@ for trial_num, idx in enumerate(available_indices, 1):
     show_image_for_ms(target_img, target_rect, 1500)
     show_image_for_ms(image3, image3_rect, 500)
     
-    gt_mask = pygame.image.load(os.path.join(MASK_DIR, f"gt{trial_num+1}.jpg")).convert()
+    gt_mask = pygame.image.load(os.path.join(MASK_DIR, f"gt{idx}.jpg")).convert()
 
     screen.fill((0,0,0))
     screen.blit(stim_img, stim_rect.topleft)
     pygame.display.flip()
+    # response times count from the flip of the search screen
+    start_time = time.perf_counter()
 
 # for trial in range(NUM_REPETITIONS):
 #     print(f"\nStarting trial {trial + 1}")
@@ -97,47 +108,49 @@ for trial_num, idx in enumerate(available_indices, 1):
 #     screen.blit(image4,image4_rect.topleft)
 #     pygame.display.flip()
 
-    start_time = time.time()
+    deadline = start_time + 20.0  # timeout after 20 seconds
     clicked = False
     timeout = False
 
     while not clicked and not timeout:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                click_pos = event.pos
-                reaction_time = time.time() - start_time
-                reaction_times.append(reaction_time)  # Record reaction time regardless 
-                print(f"Trial {trial_num}: Mouse clicked at {click_pos}")
-                print(f"Reaction time: {reaction_time:.2f} seconds")
-
-                if 0 <= click_pos[0] < gt_mask.get_width() and 0 <= click_pos[1] < gt_mask.get_height():
-                    pixel = gt_mask.get_at(click_pos)  # Returns (R, G, B, A)
-                    if pixel[:3] == (255, 255, 255):  # Check if white
-                        print("Correct! You clicked on the object.")
-                        reaction_times.append(reaction_time)
-                        clicked = True
-                        game_over = False
-                    else:
-                        print("Incorrect. Try again.")
-                        reaction_times.append(reaction_time)
-                        clicked = False
-
-        #timeout after 20000 ms (20 seconds)
-        if (time.time() - start_time) > 20.0: #pygame uses ms, python uses s
+        response = wait_response(deadline)
+        if response.kind == ABORT:
+            pygame.quit()
+            sys.exit()
+        elif response.kind == CLICK:
+            click_pos = response.pos
+            reaction_time = response.rt(start_time)
+            print(f"Trial {trial_num}: Mouse clicked at {click_pos}")
+            print(f"Reaction time: {reaction_time:.2f} seconds")
+
+            hit = False
+            if 0 <= click_pos[0] < gt_mask.get_width() and 0 <= click_pos[1] < gt_mask.get_height():
+                pixel = gt_mask.get_at(click_pos)  # Returns (R, G, B, A)
+                hit = pixel[:3] == (255, 255, 255)  # Check if white
+            results_log.click(trial_num, idx, click_pos, hit, reaction_time)
+
+            if hit:
+                print("Correct! You clicked on the object.")
+                reaction_times.append(reaction_time)
+                clicked = True
+                game_over = False
+            else:
+                print("Incorrect. Try again.")
+                clicked = False
+        elif response.kind == TIMEOUT:
             print (f"Trial {trial_num + 1}: Timeout! No click registered within 20s.")
             reaction_times.append(20.0) #record max time for timeout
             timeout = True #break loop on timeout
 
+    results_log.trial(trial_num, idx, clicked, reaction_times[-1], timeout)
+
     if game_over:
         break
 
 #after all trials, calculate avg rxn time
 avg_rt = sum(reaction_times)/ len(reaction_times)
 print (f"\nAll trials completed. Average reaction time: {avg_rt: .2f} seconds")
+results_log.close()
 
 pygame.quit()
 sys.exit()
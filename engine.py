@@ -0,0 +1,1446 @@
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+from string import ascii_letters, digits
+
+# when the engine started loading, the start of the --profile-startup report
+IMPORT_TIME = time.perf_counter()
+
+import pygame
+from pygame.locals import *
+from linkmessages import MessageQueue
+from presentation import Abort, Presenter
+from responses import ABORT, CLICK, KEY, TIMEOUT, wait_response
+from resultslog import ResultsLog
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+# Experiment engine of the eye tracking scripts
+#
+# naturalimages.py, naturalfinalimages.py, naturalworkingimages.py,
+# naturalimages, weichengimages and picturewc were copies of the same
+# script that differed in a few variables. The session (EDF file, tracker
+# connection and setup, window, calibration, trials and EDF download) now
+# runs here, once; each script is only the SessionConfig of its
+# differences, and any option can be overridden from a TOML file or from
+# the command line, e.g.,
+#
+#     python naturalimages.py --config pilot.toml --trials 10 --windowed
+#     python naturalimages.py --set search_timeout_s=10 --set display=1
+#
+# Two tasks are supported: 'search' (the natural image search: fixation,
+# target, fixation, then click on the target in the stimulus) and
+# 'picture' (the picturewc free viewing, the SPACEBAR ends a trial).
+#
+# Importing the engine (or a script) does not touch the tracker or the
+# screen: pylink, the calibration graphics and the task modules (NumPy and
+# the image caches) are imported when the session gets to them, and only
+# the pygame subsystems the session uses are initialised, once the options
+# are valid and the EDF filename is known. --profile-startup prints how
+# long each startup step took.
+#
+# The trial order is drawn ahead of the session (schedule.py) and the
+# session is checkpointed after every trial (checkpoint.py): a session that
+# stopped halfway continues with "--resume <session_identifier>".
+
+# loaded by load_pylink() when the session starts
+pylink = None
+
+# the session options and their defaults
+DEFAULTS = {
+    # 'search' or 'picture'
+    'task': 'search',
+    # search: the number of images, trials show images 1..num_trials
+    'num_trials': 240,
+    # present the trials in random order
+    'shuffle': True,
+    # the participant seed the trial order is drawn from, a random one
+    # (recorded in the session's schedule file) if not set
+    'seed': None,
+    # counterbalancing of the trial order: 'latin' for the row (the seed)
+    # of a balanced Latin square, see schedule.py
+    'counterbalance': None,
+    # picture: the longest run of trials of the same condition in a random
+    # order
+    'max_condition_run': None,
+    # a schedule file (<session>_schedule.json) to run the trials of,
+    # instead of drawing them
+    'schedule': None,
+    # the session identifier (its folder in results_dir) of a session to
+    # continue from its last checkpoint, see checkpoint.py
+    'resume': None,
+    # picture: the [condition, picture] of each trial, and how many times
+    # the list is run
+    'pictures': [['cond_1', 'img_3.jpg'], ['cond_2', 'img_2.jpg']],
+    'picture_repeats': 2,
+
+    # run without a tracker
+    'dummy_mode': True,
+    # "host:port" of a tracker simulator (see trackersim.py) to run against
+    # instead of the Host PC
+    'tracker_sim': None,
+    'host_address': '100.1.1.1',
+    # the EDF filename, asked for at startup if not set
+    'edf_name': None,
+    'calibration_type': 'HV9',
+
+    # the index of the display to open the window on
+    'display': 0,
+    'full_screen': True,
+    # (width, height) of the window when not full screen, the native
+    # resolution if not set
+    'window_size': None,
+    'mouse_visible': True,
+    # refresh rate of the display (Hz), measured at startup if not set; must
+    # be set if the display gives no flips locked to the retrace
+    'refresh_hz': None,
+
+    # media folders, relative to the script folder
+    'media_dir': 'media',
+    'images_dir': 'images',
+    'results_dir': 'results',
+    'calibration_target': os.path.join('images', 'fixTarget.bmp'),
+    # check that every image of the session exists and decodes before the
+    # EDF file is opened (see mediacheck.py)
+    'check_media': True,
+
+    # search: decoded images are kept in memory up to stim_cache_mb, the
+    # images of the next prefetch_depth trials are decoded ahead
+    'stim_cache_mb': 1024,
+    'prefetch_depth': 2,
+    # search: clicks within this many pixels of the target are correct
+    'mask_tolerance': 0,
+    # search: how often the gaze is checked during the search (in seconds)
+    'gaze_poll_s': 0.01,
+    # search: end a trial once the target has been fixated for this long
+    # (in ms), only a correct click ends the trials if not set
+    'end_on_fixation_ms': None,
+
+    # picture: image scale factor, and the resolution of the Host PC
+    # display the backdrops are downsampled to
+    'image_scale': 0.5,
+    'host_display_size': [1024, 768],
+
+    # print the time taken by each startup step
+    'profile_startup': False,
+
+    # durations of the screens
+    'fixation_ms': 500,
+    'target_ms': 1500,
+    'search_timeout_s': 20.0,
+    'picture_timeout_s': 5.0,
+    }
+
+TASKS = ('search', 'picture')
+
+
+class SessionConfig(object):
+    """ the options of a session, see DEFAULTS
+
+    options: the options that differ from the defaults
+    """
+
+    def __init__(self, **options):
+        for name, value in DEFAULTS.items():
+            setattr(self, name, value)
+        self.update(**options)
+
+    def update(self, **options):
+        """ change options; False switches off an option that defaults to
+        None, TOML has no null
+        """
+
+        for name, value in options.items():
+            if name not in DEFAULTS:
+                raise ValueError('unknown session option: %s' % name)
+            if DEFAULTS[name] is None and value is False:
+                value = None
+            setattr(self, name, value)
+        if self.task not in TASKS:
+            raise ValueError('unknown task: %s' % self.task)
+        return self
+
+    def load(self, path):
+        """ update the options from a TOML file """
+
+        if tomllib is None:
+            raise RuntimeError('reading %s needs Python 3.11 (tomllib)' % path)
+        with open(path, 'rb') as f:
+            self.update(**tomllib.load(f))
+        return self
+
+    def options(self):
+        """ return the options as a dict """
+
+        return dict((name, getattr(self, name)) for name in DEFAULTS)
+
+
+def parse_value(text):
+    """ parse a command line value as TOML, e.g., 10, 0.5, [1280, 1080],
+    true; anything else is a string
+    """
+
+    if tomllib is not None:
+        try:
+            return tomllib.loads('value = ' + text)['value']
+        except tomllib.TOMLDecodeError:
+            pass
+    return text
+
+
+def parse_args(config, argv=None):
+    """ apply the --config files and the command line flags to config """
+
+    parser = argparse.ArgumentParser(
+        description='Run an eye tracking session (%s task)' % config.task)
+    parser.add_argument('--config', action='append', default=[],
+                        metavar='TOML', help='file of session options')
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='NAME=VALUE', help='set a session option')
+    parser.add_argument('--edf', help='EDF filename (up to 8 characters)')
+    parser.add_argument('--trials', type=int, help='number of trials')
+    parser.add_argument('--seed', type=int, help='participant seed')
+    parser.add_argument('--schedule', metavar='FILE',
+                        help='replay the trials of a schedule file')
+    parser.add_argument('--resume', metavar='SESSION',
+                        help='continue a session that stopped, from its '
+                             'last completed trial')
+    parser.add_argument('--dummy', action='store_true',
+                        help='run without a tracker')
+    parser.add_argument('--sim', metavar='HOST:PORT',
+                        help='run against a tracker simulator')
+    parser.add_argument('--display', type=int,
+                        help='index of the display to use')
+    parser.add_argument('--windowed', action='store_true',
+                        help='open a window instead of the full screen')
+    parser.add_argument('--media-dir', help='folder holding the media')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='report where the startup time goes')
+    args = parser.parse_args(argv)
+
+    for path in args.config:
+        config.load(path)
+    for item in args.set:
+        name, sep, value = item.partition('=')
+        if not sep:
+            parser.error('--set expects NAME=VALUE, got %s' % item)
+        config.update(**{name.strip(): parse_value(value.strip())})
+
+    flags = {'edf_name': args.edf, 'num_trials': args.trials,
+             'seed': args.seed, 'schedule': args.schedule,
+             'resume': args.resume,
+             'tracker_sim': args.sim, 'display': args.display,
+             'media_dir': args.media_dir}
+    config.update(**dict((k, v) for k, v in flags.items() if v is not None))
+    if args.dummy:
+        config.update(dummy_mode=True, tracker_sim=None)
+    if args.sim:
+        config.update(dummy_mode=False)
+    if args.windowed:
+        config.update(full_screen=False)
+    if args.profile_startup:
+        config.update(profile_startup=True)
+    return config
+
+
+def sim_address(value):
+    """ return the (host, port) of a "host:port" or [host, port] setting """
+
+    if isinstance(value, str):
+        host, sep, port = value.rpartition(':')
+        return (host or 'localhost', int(port))
+    return tuple(value)
+
+
+def load_pylink():
+    """ import pylink, on the first call """
+
+    global pylink
+    if pylink is None:
+        import pylink
+
+
+def init_pygame():
+    """ initialise the pygame subsystems of a session: the display (and
+    its events), SDL's timer, the fonts and the mixer
+
+    pygame.init() would also start the joystick and camera subsystems,
+    which the tasks never use; returns False if there is no sound
+    """
+
+    pygame.display.init()
+    # pygame.time.get_ticks() stays at 0 until SDL's timer is started,
+    # which pygame.init() did and pygame.time.wait() does
+    pygame.time.wait(0)
+    pygame.font.init()
+    # the calibration graphics load their beeps when they are built, in
+    # Dummy Mode too
+    try:
+        pygame.mixer.init()
+    except pygame.error as err:
+        print('ERROR: no calibration sounds,', err)
+        return False
+    return True
+
+
+class StartupProfile(object):
+    """ time the startup steps of a session
+
+    enabled: report the times, otherwise the steps are not timed
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.steps = []
+        self._last = IMPORT_TIME
+        if enabled:
+            self.mark('import the engine, read the options')
+
+    def mark(self, label):
+        """ close a step: the time since the previous mark is label's """
+
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.steps.append((label, now - self._last))
+        self._last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print('\nStartup profile:')
+        for label, seconds in self.steps:
+            print('%10.1f ms  %s' % (seconds * 1000, label))
+        total = sum(seconds for label, seconds in self.steps)
+        print('%10.1f ms  total' % (total * 1000))
+
+
+def ask_edf_name(default=None):
+    """ return a valid EDF filename, prompting for one if needed """
+
+    edf_fname = default
+    while True:
+        if edf_fname is None:
+            prompt = '\nSpecify an EDF filename\n' + \
+                'Filename must not exceed eight alphanumeric characters.\n' + \
+                'ONLY letters, numbers and underscore are allowed.\n\n--> '
+            edf_fname = input(prompt)
+        # strip trailing characters, ignore the '.edf' extension
+        edf_fname = edf_fname.rstrip().split('.')[0]
+
+        # check if the filename is valid (length <= 8 & no special char)
+        allowed_char = ascii_letters + digits + '_'
+        if not all([c in allowed_char for c in edf_fname]):
+            print('ERROR: Invalid EDF filename')
+        elif len(edf_fname) > 8:
+            print('ERROR: EDF filename should not exceed 8 characters')
+        else:
+            return edf_fname
+        edf_fname = None
+
+
+class Experiment(object):
+    """ run a session of the search or picture task
+
+    config: the SessionConfig of the session
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.el_tracker = None
+        self.win = None
+        self.genv = None
+        self.gaze_reader = None
+        self.snapshot_writer = None
+        self.task = None
+        self.eyelink_ver = 0
+        self.sound = False
+        self.schedule = None
+        self.checkpoint = None
+        # the schedule entries of the trials to run, and the tag of the
+        # files of this EDF segment ('' unless resumed)
+        self.trials = []
+        self.segment_tag = ''
+        self.profile = StartupProfile(config.profile_startup)
+
+    # Steps 0-4: set up the session
+
+    def make_schedule(self):
+        """ draw the trial schedule, or read the one to replay """
+
+        from schedule import Schedule, make_schedule
+
+        cfg = self.config
+        if cfg.schedule is not None:
+            schedule = Schedule.load(cfg.schedule)
+            if schedule.task != cfg.task:
+                print('ERROR: %s is a schedule of the %s task'
+                      % (cfg.schedule, schedule.task))
+                sys.exit(2)
+        else:
+            schedule = make_schedule(cfg)
+        print('%d trials, seed %d' % (len(schedule), schedule.seed))
+        self.schedule = schedule
+        self.trials = schedule.trials
+
+    def check_media(self):
+        """ stop if an image of the session is missing or broken, before
+        anything is opened
+        """
+
+        from mediacheck import check_session
+
+        problems = check_session(self.config, self.schedule, self.trials)
+        if problems:
+            for problem in problems:
+                print('ERROR:', problem)
+            print('ERROR: %d problem(s) with the session images, '
+                  'not starting' % len(problems))
+            sys.exit(1)
+
+    def open_session(self):
+        """ ask for the EDF filename and create the session folder """
+
+        cfg = self.config
+        self.edf_fname = ask_edf_name(cfg.edf_name)
+        self.edf_file = self.edf_fname + '.EDF'
+
+        # We download EDF data file from the EyeLink Host PC to the local
+        # hard drive at the end of each testing session, here we rename the
+        # EDF to include session start date/time
+        time_str = time.strftime("_%Y_%m_%d_%H_%M", time.localtime())
+        self.session_identifier = self.edf_fname + time_str
+
+        # create a folder for the current testing session in the results
+        # folder, it holds the EDF and the associated resources
+        self.session_folder = os.path.join(cfg.results_dir,
+                                           self.session_identifier)
+        if not os.path.exists(self.session_folder):
+            os.makedirs(self.session_folder)
+
+        from checkpoint import CHECKPOINT_SUFFIX, Checkpoint
+
+        self.schedule.save(self.session_path('_schedule.json'))
+        self.checkpoint = Checkpoint(self.session_path(CHECKPOINT_SUFFIX),
+                                     self.session_identifier,
+                                     self.schedule.seed)
+
+    def resume_session(self):
+        """ continue the session cfg.resume from its checkpoint, into a new
+        EDF segment
+        """
+
+        from checkpoint import CHECKPOINT_SUFFIX, Checkpoint, segment_edf_name
+        from schedule import Schedule
+
+        cfg = self.config
+        self.session_identifier = os.path.basename(
+            os.path.normpath(cfg.resume))
+        self.session_folder = os.path.join(cfg.results_dir,
+                                           self.session_identifier)
+        try:
+            self.checkpoint = Checkpoint.load(
+                self.session_path(CHECKPOINT_SUFFIX))
+            self.schedule = Schedule.load(self.session_path('_schedule.json'))
+        except (OSError, ValueError) as err:
+            print('ERROR: cannot resume %s: %s' % (cfg.resume, err))
+            sys.exit(2)
+        if self.schedule.task != cfg.task:
+            print('ERROR: %s is a session of the %s task'
+                  % (cfg.resume, self.schedule.task))
+            sys.exit(2)
+
+        self.trials = self.checkpoint.trials_left(self.schedule)
+        if not self.trials:
+            print('Session %s is complete, all %d trials were run'
+                  % (self.session_identifier, len(self.schedule)))
+            sys.exit()
+
+        # the trials left go to a new EDF file, named after the first one
+        segment = len(self.checkpoint.segments) + 1
+        first_edf = self.checkpoint.segments[0]['edf_file']
+        self.edf_fname = segment_edf_name(first_edf.split('.')[0], segment)
+        self.edf_file = self.edf_fname + '.EDF'
+        self.segment_tag = '_seg%d' % segment
+        print('Resuming %s, %d of %d trials left (%d to run again), '
+              'EDF segment %d'
+              % (self.session_identifier, len(self.trials),
+                 len(self.schedule), len(self.checkpoint.failed), segment))
+
+    def session_path(self, suffix):
+        """ return the path of a session file, e.g., '_results.jsonl' """
+
+        return os.path.join(self.session_folder,
+                            self.session_identifier + suffix)
+
+    def edf_path(self):
+        """ return the path the EDF file is downloaded to """
+
+        return self.session_path(self.segment_tag + '.EDF')
+
+    def trial_done(self, trial, result):
+        """ checkpoint the session after a trial of the schedule
+
+        result: dict of the outcome of the trial, None if it failed, it is
+                then run again when the session is resumed
+        """
+
+        if self.checkpoint is not None:
+            self.checkpoint.trial_done(trial, result)
+
+    def connect(self):
+        """ Step 1: connect to the EyeLink Host PC (or simulator) """
+
+        cfg = self.config
+        try:
+            if cfg.tracker_sim is not None:
+                import trackersim
+                self.el_tracker = trackersim.connect(
+                    sim_address(cfg.tracker_sim))
+            elif cfg.dummy_mode:
+                self.el_tracker = pylink.EyeLink(None)
+            else:
+                self.el_tracker = pylink.EyeLink(cfg.host_address)
+        except RuntimeError as error:
+            print('ERROR:', error)
+            pygame.quit()
+            sys.exit()
+
+        # read the samples and events sent over the link on a background
+        # thread; the thread only runs while a trial is recording, so it
+        # never calls into pylink during the setup, calibration or drift
+        # correction
+        from gazereader import GazeReader
+        self.gaze_reader = GazeReader(self.el_tracker)
+
+    def open_data_file(self):
+        """ Step 2: open an EDF data file on the Host PC """
+
+        el_tracker = self.el_tracker
+        try:
+            el_tracker.openDataFile(self.edf_file)
+        except RuntimeError as err:
+            print('ERROR:', err)
+            # close the link if we have one open
+            if el_tracker.isConnected():
+                el_tracker.close()
+            pygame.quit()
+            sys.exit()
+
+        # Add a header text to the EDF file to identify the current
+        # experiment, shown in Data Viewer's Inspector window
+        preamble_text = 'RECORDED BY %s' % os.path.basename(sys.argv[0])
+        el_tracker.sendCommand("add_file_preamble_text '%s'" % preamble_text)
+
+    def configure_tracker(self):
+        """ Step 3: configure the tracker """
+
+        el_tracker = self.el_tracker
+        # Put the tracker in offline mode before we change tracking parameters
+        el_tracker.setOfflineMode()
+
+        # Get the software version:  1-EyeLink I, 2-EyeLink II, 3/4-EyeLink
+        # 1000, 5-EyeLink 1000 Plus, 6-Portable DUO
+        if not self.config.dummy_mode:
+            vstr = el_tracker.getTrackerVersionString()
+            self.eyelink_ver = int(vstr.split()[-1].split('.')[0])
+            # print out some version info in the shell
+            print('Running experiment on %s, version %d' % (vstr,
+                                                            self.eyelink_ver))
+
+        # File and Link data control
+        # what eye events to save in the EDF file, include everything
+        file_event_flags = 'LEFT,RIGHT,FIXATION,SACCADE,BLINK,MESSAGE,BUTTON,INPUT'
+        # what eye events to make available over the link
+        link_event_flags = 'LEFT,RIGHT,FIXATION,SACCADE,BLINK,BUTTON,FIXUPDATE,INPUT'
+        # what sample data to save in the EDF data file and to make
+        # available over the link, include the 'HTARGET' flag to save head
+        # target sticker data for supported eye trackers
+        if self.eyelink_ver > 3:
+            file_sample_flags = 'LEFT,RIGHT,GAZE,HREF,RAW,AREA,HTARGET,GAZERES,BUTTON,STATUS,INPUT'
+            link_sample_flags = 'LEFT,RIGHT,GAZE,GAZERES,AREA,HTARGET,STATUS,INPUT'
+        else:
+            file_sample_flags = 'LEFT,RIGHT,GAZE,HREF,RAW,AREA,GAZERES,BUTTON,STATUS,INPUT'
+            link_sample_flags = 'LEFT,RIGHT,GAZE,GAZERES,AREA,STATUS,INPUT'
+        el_tracker.sendCommand("file_event_filter = %s" % file_event_flags)
+        el_tracker.sendCommand("file_sample_data = %s" % file_sample_flags)
+        el_tracker.sendCommand("link_event_filter = %s" % link_event_flags)
+        el_tracker.sendCommand("link_sample_data = %s" % link_sample_flags)
+
+        # Choose a calibration type, H3, HV3, HV5, HV13 (HV =
+        # horizontal/vertical)
+        el_tracker.sendCommand("calibration_type = %s"
+                               % self.config.calibration_type)
+        # Set a gamepad button to accept calibration/drift check target
+        el_tracker.sendCommand("button_function 5 'accept_target_fixation'")
+
+    def open_window(self):
+        """ Step 4: open the window and set up the calibration graphics """
+
+        cfg = self.config
+        if cfg.full_screen:
+            size, flags = (0, 0), FULLSCREEN | DOUBLEBUF
+        else:
+            size = tuple(cfg.window_size) if cfg.window_size else (0, 0)
+            flags = 0
+        # ask for flips locked to the retrace, so the Presenter can measure
+        # the refresh rate; pygame only gives them with SCALED (or OPENGL),
+        # which needs the actual size of the display
+        if size == (0, 0):
+            size = pygame.display.get_desktop_sizes()[cfg.display]
+        try:
+            self.win = pygame.display.set_mode(size, flags | SCALED,
+                                               display=cfg.display, vsync=1)
+        except pygame.error as err:
+            print('WARNING: no vsync display (%s), flips will not be locked '
+                  'to the retrace' % err)
+            self.win = pygame.display.set_mode(size, flags,
+                                               display=cfg.display)
+        pygame.display.set_caption("Object Search Game")
+        self.win_rect = self.win.get_rect()
+        self.scn_width, self.scn_height = self.win.get_size()
+        pygame.mouse.set_visible(cfg.mouse_visible)
+
+        # Pass the display pixel coordinates (left, top, right, bottom) to
+        # the tracker, see the EyeLink Installation Guide, "Customizing
+        # Screen Settings"
+        el_coords = "screen_pixel_coords = 0 0 %d %d" % (self.scn_width - 1,
+                                                         self.scn_height - 1)
+        self.el_tracker.sendCommand(el_coords)
+
+        # Write a DISPLAY_COORDS message to the EDF file, Data Viewer needs
+        # it for proper visualization
+        dv_coords = "DISPLAY_COORDS  0 0 %d %d" % (self.scn_width - 1,
+                                                   self.scn_height - 1)
+        self.el_tracker.sendMessage(dv_coords)
+
+        # Configure a graphics environment (genv) for tracker calibration
+        from CalibrationGraphicsPygame import CalibrationGraphics
+        genv = CalibrationGraphics(self.el_tracker, self.win)
+        # parameters: foreground_color, background_color
+        genv.setCalibrationColors((0, 0, 0), (128, 128, 128))
+        # Use a picture as the calibration target
+        genv.setTargetType('picture')
+        genv.setPictureTarget(cfg.calibration_target)
+        # Beeps to play during calibration, validation and drift correction,
+        # if there is a sound device
+        if self.sound:
+            genv.setCalibrationSounds('', '', '')
+        else:
+            genv.setCalibrationSounds('off', 'off', 'off')
+        self.genv = genv
+
+        # Request Pylink to use the Pygame window for calibration
+        pylink.openGraphicsEx(genv)
+
+    # helper functions for trial handling
+
+    def show_message(self, message, fg_color, bg_color):
+        """ show messages on the screen
+
+        message: The message you would like to show on the screen
+        fg_color/bg_color: color for the texts and the background screen
+        """
+
+        # clear the screen and blit the texts
+        win_surf = self.win
+        win_surf.fill(bg_color)
+
+        scn_w, scn_h = win_surf.get_size()
+        message_fnt = pygame.font.SysFont('Arial', 32)
+        msgs = message.split('\n')
+        for i in range(len(msgs)):
+            message_surf = message_fnt.render(msgs[i], True, fg_color)
+            w, h = message_surf.get_size()
+            msg_y = scn_h / 2 + h / 2 * 2.5 * (i - len(msgs) / 2.0)
+            win_surf.blit(message_surf, (int(scn_w / 2 - w / 2), int(msg_y)))
+
+        pygame.display.flip()
+
+    def wait_key(self, key_list, duration=None):
+        """ detect and return a keypress, terminate the task if ESCAPE is
+        pressed
+
+        key_list: allowable keys (pygame key constants, e.g., [K_a, K_ESCAPE]
+        duration: the maximum time allowed to issue a response (in ms)
+                  wait for response 'indefinitely' if None
+
+        returns [key name, start time, key press time], the times in ms on
+        the time.perf_counter() clock; the key name is None and the key
+        press time -1 on a timeout
+        """
+
+        # clear all cached events if there are any
+        pygame.event.clear()
+        t_start = time.perf_counter()
+        resp = [None, int(t_start * 1000), -1]
+        deadline = float('inf') if duration is None \
+            else t_start + duration / 1000.0
+        keys = tuple(key_list) + (K_ESCAPE, K_c)
+
+        # block on the event queue until a key press, nothing runs meanwhile
+        while True:
+            response = wait_response(deadline, keys, clicks=False)
+            if response.kind == TIMEOUT:
+                break
+            if response.kind == ABORT:
+                self.terminate_task()
+            if response.key in key_list:
+                resp = [pygame.key.name(response.key), int(t_start * 1000),
+                        response.time_ns // 1000000]
+                break
+            if response.key == K_ESCAPE or \
+                    (response.key == K_c and response.mod & KMOD_CTRL):
+                self.terminate_task()
+
+        # clear the screen following each keyboard response
+        self.win.fill(self.genv.getBackgroundColor())
+        pygame.display.flip()
+
+        return resp
+
+    def terminate_task(self):
+        """ Terminate the task gracefully and retrieve the EDF data file """
+
+        el_tracker = self.el_tracker
+
+        # stop reading the link before it gets closed
+        if self.gaze_reader is not None:
+            self.gaze_reader.stop()
+
+        if el_tracker is not None and el_tracker.isConnected():
+            # Terminate the current trial first if the task terminated
+            # prematurely
+            error = el_tracker.isRecording()
+            if error == pylink.TRIAL_OK:
+                self.abort_trial()
+
+            # Put tracker in Offline mode
+            el_tracker.setOfflineMode()
+
+            # Clear the Host PC screen and wait for 500 ms
+            el_tracker.sendCommand('clear_screen 0')
+            pylink.msecDelay(500)
+
+            # Close the edf data file on the Host
+            el_tracker.closeDataFile()
+
+            # Show a file transfer message on the screen
+            msg = 'EDF data is transferring from EyeLink Host PC...'
+            self.show_message(msg, (0, 0, 0), (128, 128, 128))
+
+            # Download the EDF data file from the Host PC to the session
+            # folder
+            try:
+                el_tracker.receiveDataFile(self.edf_file, self.edf_path())
+            except RuntimeError as error:
+                print('ERROR:', error)
+
+            # Close the link to the tracker.
+            el_tracker.close()
+
+        # flush the timing and results logs of the task
+        if self.task is not None:
+            self.task.close()
+
+        # write the trial snapshots still waiting in the queue
+        if self.snapshot_writer is not None:
+            if self.snapshot_writer.backlog():
+                print('Writing %d pending snapshot(s)...'
+                      % self.snapshot_writer.backlog())
+            self.snapshot_writer.close()
+
+        # quit pygame and python
+        pygame.quit()
+        sys.exit()
+
+    def abort_trial(self):
+        """ Ends recording
+
+        We add 100 msec to catch final events
+        """
+
+        el_tracker = self.el_tracker
+
+        # stop reading the link before the recording stops
+        if self.gaze_reader is not None:
+            self.gaze_reader.stop()
+
+        # Stop recording
+        if el_tracker.isRecording():
+            # add 100 ms to catch final trial events
+            pylink.pumpDelay(100)
+            el_tracker.stopRecording()
+
+        # clear the screen
+        self.win.fill((128, 128, 128))
+        pygame.display.flip()
+        # Send a message to clear the Data Viewer screen
+        el_tracker.sendMessage('!V CLEAR 128 128 128')
+
+        # send a message to mark trial end
+        el_tracker.sendMessage('TRIAL_RESULT %d' % pylink.TRIAL_ERROR)
+
+        return pylink.TRIAL_ERROR
+
+    def calibrate(self):
+        """ Step 5: show the instructions and calibrate the tracker """
+
+        if self.config.task == 'search':
+            task_msg = 'In the task, click on the object as soon as you ' + \
+                'find it\n'
+        else:
+            task_msg = 'In the task, you may press the SPACEBAR to end a ' + \
+                'trial\n'
+        task_msg = task_msg + \
+            '\nPress Ctrl-C to if you need to quit the task early\n'
+        if self.config.dummy_mode:
+            task_msg = task_msg + '\nNow, press ENTER to start the task'
+        else:
+            task_msg = task_msg + '\nNow, press ENTER to calibrate tracker'
+
+        # Pygame bug warning
+        pygame_warning = '\n\nDue to a bug in Pygame 2, the window may have ' + \
+            'lost\nfocus and stopped accepting keyboard inputs.' + \
+            '\nClicking the mouse helps get around this issue.'
+        if pygame.__version__.split('.')[0] == '2':
+            task_msg = task_msg + pygame_warning
+
+        self.show_message(task_msg, (0, 0, 0), (128, 128, 128))
+        self.wait_key([K_RETURN])
+
+        # skip this step if running the script in Dummy Mode
+        if not self.config.dummy_mode:
+            try:
+                self.el_tracker.doTrackerSetup()
+            except RuntimeError as err:
+                print('ERROR:', err)
+                self.el_tracker.exitCalibration()
+
+    def run(self):
+        """ run the whole session, from the EDF filename to the download """
+
+        cfg = self.config
+        profile = self.profile
+        if cfg.resume is not None:
+            self.resume_session()
+        else:
+            self.make_schedule()
+        profile.mark('draw the trial schedule')
+        if cfg.check_media:
+            self.check_media()
+            profile.mark('check the session images')
+        if cfg.resume is None:
+            self.open_session()
+        self.checkpoint.start_segment(
+            self.edf_file, os.path.basename(self.edf_path()))
+        profile.mark('EDF filename and session folder')
+        load_pylink()
+        profile.mark('import pylink')
+        self.connect()
+        profile.mark('connect to the tracker')
+        self.open_data_file()
+        profile.mark('open the EDF file')
+        self.configure_tracker()
+        profile.mark('configure the tracker')
+        self.sound = init_pygame()
+        profile.mark('initialise pygame')
+        self.open_window()
+        profile.mark('open the window and calibration graphics')
+        try:
+            if cfg.task == 'search':
+                self.task = SearchTask(self)
+            else:
+                self.task = PictureTask(self)
+        except RuntimeError as err:
+            print('ERROR:', err)
+            self.terminate_task()
+        profile.mark('set up the %s task' % cfg.task)
+        profile.report()
+
+        self.calibrate()
+
+        # Step 6: run the trials; quitting while a screen is up ends the
+        # session the same way as at a prompt
+        try:
+            self.task.run()
+        except Abort:
+            self.terminate_task()
+
+        # Step 7: disconnect, download the EDF file, then terminate the task
+        self.terminate_task()
+
+
+class SearchTask(object):
+    """ the natural image search: fixation, target, fixation, then the
+    stimulus until the target is clicked or the search times out
+
+    exp: the running Experiment
+    """
+
+    def __init__(self, exp):
+        from interestareas import InterestAreaCache
+        from maskstore import MaskStore
+        from mediabundle import open_bundle
+        from stimcache import StimulusCache
+
+        cfg = exp.config
+        self.exp = exp
+        self.config = cfg
+        self.background_dir = os.path.join(cfg.media_dir, 'backgrounds')
+        self.target_dir = os.path.join(cfg.media_dir, 'targets')
+        self.stimuli_dir = os.path.join(cfg.media_dir, 'stimuli')
+        self.mask_dir = os.path.join(cfg.media_dir, 'gt')
+
+        # if the media have been packed for this display with "python
+        # mediabundle.py media", the images are slices of the memory-mapped
+        # bundle, never decoded during the session and, in the window's
+        # pixel format, blitted straight from the mapping
+        self.bundle = open_bundle(cfg.media_dir,
+                                  (exp.scn_width, exp.scn_height), exp.win)
+
+        # Decoded and convert()-ed images are kept in memory, gt masks as
+        # thresholded bitmaps
+        self.stim_cache = StimulusCache(cfg.stim_cache_mb, self.mask_dir,
+                                        cfg.mask_tolerance, self.bundle)
+
+        # if the masks have been packed with "python maskstore.py media/gt
+        # media/gt_masks.bin", they are looked up in the memory-mapped store
+        # and never decoded during the session; masks missing from the store,
+        # or changed since it was built, are decoded as before
+        self.mask_store = None
+        mask_store_path = os.path.join(cfg.media_dir, 'gt_masks.bin')
+        if os.path.exists(mask_store_path):
+            try:
+                self.mask_store = MaskStore(mask_store_path, self.mask_dir)
+            except RuntimeError as err:
+                print('ERROR:', err)
+        if self.mask_store is not None:
+            stale = self.mask_store.check()
+            if stale:
+                print('%d gt mask(s) changed since the mask store was built, '
+                      'loading them instead' % len(stale))
+
+        # the targets are sent to the EDF as interest areas, computed from
+        # the gt masks once and cached; the areas of the session's trials
+        # are loaded here, so the trials only look them up in memory
+        self.interest_areas = InterestAreaCache(
+            os.path.join(self.mask_dir, '.interestareas'))
+        self.interest_areas.preload(
+            trial['assets'][2]
+            for trial in exp.trials)
+
+        # every flip of the trial sequence is logged to a per-session timing
+        # log, clicks and trial outcomes to a per-session results log
+        self.presenter = Presenter(exp.win, cfg.refresh_hz,
+                                   exp.session_path(exp.segment_tag +
+                                                    '_timing.csv'))
+        self.results_log = ResultsLog(exp.session_path('_results.jsonl'))
+        self.prefetcher = None
+
+    def mask_packed(self, idx, mask_path):
+        """ return True if the gt mask is in the media bundle or the mask
+        store, and needs no decoding
+        """
+
+        if self.bundle is not None and mask_path in self.bundle:
+            return True
+        return self.mask_store is not None and idx in self.mask_store
+
+    def load_centered_image(self, path):
+        image = self.stim_cache.get(path)
+        rect = image.get_rect()
+        rect.center = self.exp.win_rect.center
+        return image, rect
+
+    def run(self):
+        from prefetch import TrialPrefetcher
+
+        cfg = self.config
+        exp = self.exp
+        # a resumed session only runs the trials left, the images of the
+        # trials already run are not loaded again
+        trials = exp.trials
+
+        fixation = self.load_centered_image(
+            os.path.join(self.background_dir, 'image1.png'))
+        fixation_after = self.load_centered_image(
+            os.path.join(self.background_dir, 'image3.png'))
+
+        # load the images of the first trial up front, the prefetcher
+        # decodes the images the schedule lists for the following trials on
+        # a worker thread while the current one is running
+        prefetch_paths = [
+            trial['assets'][:2]
+            if self.mask_packed(trial['index'], trial['assets'][2])
+            else trial['assets'] for trial in trials]
+        self.stim_cache.preload(prefetch_paths[0])
+        self.prefetcher = TrialPrefetcher(self.stim_cache, prefetch_paths,
+                                          cfg.prefetch_depth)
+        self.prefetcher.start()
+
+        for pos, trial in enumerate(trials):
+            self.prefetcher.collect(pos)
+            result = self.run_trial(trial['trial'], trial['index'],
+                                    trial['assets'], fixation, fixation_after)
+            exp.trial_done(trial, result)
+
+        self.close()
+
+    def close(self):
+        """ stop the prefetcher, close the timing and results logs """
+
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        self.presenter.close()
+        self.results_log.close()
+
+    def run_trial(self, trial_num, idx, paths, fixation, fixation_after):
+        """ run the search trial of an image
+
+        trial_num: the position of the trial in the session
+        idx: the image index of the trial
+        paths: the (target, stimulus, gt mask) paths of the image
+        fixation/fixation_after: the (image, rect) of the fixation screens
+
+        returns the outcome of the trial (result, hit, rt, timeout, ttff),
+        None if the recording did not start
+        """
+
+        from interestareas import TargetFixations
+
+        cfg = self.config
+        exp = self.exp
+        el_tracker = exp.el_tracker
+        gaze_reader = exp.gaze_reader
+        presenter = self.presenter
+
+        print(f"\nStarting trial {trial_num} with image index {idx:03}")
+        presenter.start_trial(trial_num)
+        target_path, stim_path, mask_path = paths
+        target_img, target_rect = self.load_centered_image(target_path)
+        stim_img, stim_rect = self.load_centered_image(stim_path)
+
+        # the mask and interest area are in memory (see __init__), nothing
+        # is read or decoded between the screens
+        area = self.interest_areas.lookup(mask_path)
+        if self.bundle is not None and mask_path in self.bundle:
+            gt_mask = self.bundle.mask(mask_path, cfg.mask_tolerance)
+            area = area.scaled(self.bundle.scale(mask_path))
+        elif self.mask_store is not None and idx in self.mask_store:
+            gt_mask = self.mask_store.lookup(idx, cfg.mask_tolerance)
+        else:
+            gt_mask = self.stim_cache.get(mask_path)
+        target_fixations = TargetFixations(gaze_reader, area, gt_mask,
+                                           stim_rect.topleft)
+
+        # record the trial; recording starts ahead of the fixation screens,
+        # so the link has settled by the time the search comes up
+        el_tracker.setOfflineMode()
+        el_tracker.sendMessage('TRIALID %d' % trial_num)
+        try:
+            el_tracker.startRecording(1, 1, 1, 1)
+        except RuntimeError as error:
+            print("ERROR:", error)
+            # the trial is run again when the session is resumed
+            exp.abort_trial()
+            return None
+        gaze_reader.start_trial()
+        gaze_reader.start()
+
+        presenter.show(fixation[0], fixation[1], cfg.fixation_ms, (0, 0, 0),
+                       'fixation')
+        target_timing = presenter.show(target_img, target_rect, cfg.target_ms,
+                                       (0, 0, 0), 'target')
+        presenter.show(fixation_after[0], fixation_after[1], cfg.fixation_ms,
+                       (0, 0, 0), 'fixation')
+
+        exp.win.fill((0, 0, 0))
+        exp.win.blit(stim_img, stim_rect.topleft)
+        search_timing = presenter.flip('search')
+        target_fixations.start()
+
+        # the messages are sent once the search is over, with their time
+        # offset: no link I/O while a response can come in, so a response
+        # is stamped as soon as the event wait returns
+        messages = MessageQueue(el_tracker)
+        messages.message('image_onset', int(search_timing.onset * 1e9))
+        for msg in area.iarea_messages(stim_rect.topleft):
+            messages.message(msg)
+
+        # response times count from the measured flip of the search screen
+        start_time = search_timing.onset
+        deadline = start_time + cfg.search_timeout_s
+        clicked = False
+        timeout = False
+        reaction_time = cfg.search_timeout_s
+
+        while not clicked and not timeout:
+            response = wait_response(min(deadline,
+                                         time.perf_counter() + cfg.gaze_poll_s),
+                                     keys=(K_ESCAPE,))
+            # ESCAPE ends the session, as on every other screen
+            if response.kind in (ABORT, KEY):
+                messages.message('terminated_by_user', response.time_ns)
+                gaze_reader.stop()
+                messages.flush()
+                exp.terminate_task()
+            elif response.kind == CLICK:
+                click_pos = response.pos
+                rt = response.rt(start_time)
+                messages.message('mouse_click %d %d' % click_pos,
+                                 response.time_ns)
+
+                # the mask is aligned with the stimulus, not the screen
+                hit = gt_mask.hit(click_pos, stim_rect.topleft)
+                self.results_log.click(trial_num, idx, click_pos, hit, rt)
+                if hit:
+                    print("Correct! You clicked on the object.")
+                    print(f"Reaction time: {rt:.2f} seconds. Mouse clicked at {click_pos}")
+                    reaction_time = rt
+                    clicked = True
+                else:
+                    print("Incorrect. Try again.")
+            elif response.kind == TIMEOUT and response.time < deadline:
+                # nothing happened, follow the gaze (from the samples the
+                # GazeReader has already taken off the link)
+                dwell = target_fixations.update()
+                if cfg.end_on_fixation_ms is not None and \
+                        dwell >= cfg.end_on_fixation_ms:
+                    reaction_time = response.rt(start_time)
+                    print(f"Target fixated for {dwell} ms.")
+                    clicked = True
+            elif response.kind == TIMEOUT:
+                print(f"Trial {trial_num}: Timeout! No click registered "
+                      f"within {cfg.search_timeout_s:g}s.")
+                timeout = True
+
+        target_fixations.update()
+        ttff = target_fixations.time_to_first_fixation()
+        if ttff is not None:
+            print(f"Time to first fixation on the target: {ttff} ms")
+        gaze_reader.stop()
+
+        # stop recording; add 100 msec to catch final events before stopping
+        messages.flush()
+        pylink.pumpDelay(100)
+        el_tracker.stopRecording()
+        el_tracker.sendMessage('!V TRIAL_VAR image %d' % idx)
+        el_tracker.sendMessage('!V TRIAL_VAR RT %d' % int(reaction_time * 1000))
+        el_tracker.sendMessage('!V TRIAL_VAR hit %d' % clicked)
+        el_tracker.sendMessage('TRIAL_RESULT %d' % pylink.TRIAL_OK)
+
+        self.results_log.trial(trial_num, idx, clicked, reaction_time, timeout,
+                               {'target_onset': target_timing.onset,
+                                'search_onset': search_timing.onset,
+                                'ttff': ttff,
+                                'dropped_frames': presenter.timer.dropped})
+
+        if presenter.timer.dropped:
+            print(f"Trial {trial_num}: {presenter.timer.dropped} dropped frame(s)")
+
+        return {'result': pylink.TRIAL_OK, 'hit': clicked,
+                'rt': reaction_time, 'timeout': timeout, 'ttff': ttff}
+
+
+class PictureTask(object):
+    """ the picture free viewing: each picture is shown until the SPACEBAR
+    is pressed or picture_timeout_s is over
+
+    exp: the running Experiment
+    """
+
+    def __init__(self, exp):
+        from prerender import PrerenderCache
+        from snapshots import SnapshotWriter
+
+        cfg = exp.config
+        self.exp = exp
+        self.config = cfg
+
+        # the rendered_*.png snapshots of the trials are compressed and
+        # written to disk by a background writer, not by the presentation
+        # loop
+        exp.snapshot_writer = SnapshotWriter(max_pending=8)
+
+        # The pictures are rendered for this screen layout (size and
+        # image_scale), together with their Host backdrops, by "python
+        # prerender.py" ahead of the session; anything not rendered yet is
+        # rendered here, once
+        host_size = cfg.host_display_size
+        self.prerender = PrerenderCache(
+            os.path.join(cfg.images_dir, '.prerendered'),
+            (exp.scn_width, exp.scn_height), cfg.image_scale,
+            tuple(host_size) if host_size else None)
+        trials = exp.trials
+        for path in sorted(set(trial['assets'][0] for trial in trials)):
+            self.prerender.load(path)
+
+        # every flip of a trial is logged to a per-session timing log
+        self.presenter = Presenter(exp.win, cfg.refresh_hz,
+                                   exp.session_path(exp.segment_tag +
+                                                    '_timing.csv'))
+
+    def run(self):
+        exp = self.exp
+        for trial in exp.trials:
+            result = self.run_trial([trial['condition'], trial['picture']],
+                                    trial['trial'])
+            exp.trial_done(trial, None if result is None
+                           else {'result': result})
+        self.close()
+
+    def close(self):
+        """ close the timing log """
+
+        self.presenter.close()
+
+    def run_trial(self, trial_pars, trial_index):
+        """ Helper function specifying the events that will occur in a
+        single trial
+
+        trial_pars - a list containing trial parameters, e.g.,
+                    ['cond_1', 'img_1.jpg']
+        trial_index - record the order of trial presentation in the task
+
+        returns the pylink trial result, None if the recording did not start
+        or the tracker stopped recording
+        """
+
+        cfg = self.config
+        exp = self.exp
+        el_tracker = exp.el_tracker
+        gaze_reader = exp.gaze_reader
+        snapshot_writer = exp.snapshot_writer
+        presenter = self.presenter
+        scn_width, scn_height = exp.scn_width, exp.scn_height
+        pygame.mouse.set_visible(cfg.mouse_visible)
+        presenter.start_trial(trial_index)
+
+        # unpacking the trial parameters
+        cond, pic = trial_pars
+
+        # get the pre-rendered screen (the image scaled and centered on the
+        # gray background) and the Host backdrop of the picture
+        screen_img, backdrop, layout = self.prerender.load(
+            os.path.join(cfg.images_dir, pic))
+        img_width, img_height = layout['image_size']
+        img_ratio = img_width / img_height
+        new_width, new_height = layout['scaled_size']
+
+        if trial_index == 1:
+            print(f'Screen ratio: {scn_width / scn_height:.2f}')
+            print(f'Screen size: {scn_width}x{scn_height}')
+            print(f'Image scale factor: {cfg.image_scale:.2f}')
+        print(f'({trial_index}) Image ratio: {img_ratio:.2f}')
+        print(f'({trial_index}) Orig image size: {img_width}x{img_height}')
+        print(f'({trial_index}) New image size: {new_width}x{new_height}')
+        print(f'({trial_index}) Snapshot backlog: {snapshot_writer.backlog()}')
+
+        # get the currently active window
+        surf = exp.win
+
+        # put the tracker in the offline mode first
+        el_tracker.setOfflineMode()
+
+        # clear the host screen before we draw the backdrop
+        el_tracker.sendCommand('clear_screen 0')
+
+        # The backdrop pixels come pre-rendered from the PrerenderCache
+        surf.blit(screen_img, (0, 0))
+        bd_width, bd_height, pixels = backdrop
+        el_tracker.bitmapBackdrop(bd_width, bd_height, pixels,
+                                  0, 0, bd_width, bd_height,
+                                  0, 0, pylink.BX_MAXCONTRAST)
+        rendered_img_path = os.path.join(exp.session_folder,
+                                         f'rendered_{trial_index}_{pic}')
+        snapshot_writer.submit(surf, rendered_img_path)
+
+        # OPTIONAL: draw landmarks on the Host screen
+        left = int(scn_width/2.0) - 60
+        top = int(scn_height/2.0) - 60
+        right = int(scn_width/2.0) + 60
+        bottom = int(scn_height/2.0) + 60
+        draw_cmd = 'draw_filled_box %d %d %d %d 1' % (left, top, right, bottom)
+        el_tracker.sendCommand(draw_cmd)
+
+        # send a "TRIALID" message to mark the start of a trial, see Data
+        # Viewer User Manual, "Protocol for EyeLink Data to Viewer
+        # Integration"
+        el_tracker.sendMessage('TRIALID %d' % trial_index)
+
+        # record_status_message : show some info on the Host PC
+        status_msg = 'TRIAL number %d' % trial_index
+        el_tracker.sendCommand("record_status_message '%s'" % status_msg)
+
+        # drift check, skipped in Dummy Mode
+        # the last two arguments of doDriftCorrect():
+        # draw_target (1-default, 0-draw the target then call doDriftCorrect)
+        # allow_setup (1-press ESCAPE to recalibrate, 0-not allowed)
+        while not cfg.dummy_mode:
+            # terminate the task if no longer connected to the tracker or
+            # user pressed Ctrl-C to terminate the task
+            if (not el_tracker.isConnected()) or el_tracker.breakPressed():
+                exp.terminate_task()
+                return pylink.ABORT_EXPT
+
+            # drift-check and re-do camera setup if ESCAPE is pressed
+            try:
+                error = el_tracker.doDriftCorrect(int(scn_width/2.0),
+                                                  int(scn_height/2.0), 1, 1)
+                # break following a success drift-check
+                if error is not pylink.ESC_KEY:
+                    break
+            except:
+                pass
+
+        # put tracker in idle/offline mode before recording
+        el_tracker.setOfflineMode()
+
+        # Start recording
+        # arguments: sample_to_file, events_to_file, sample_over_link,
+        # event_over_link (1-yes, 0-no)
+        try:
+            el_tracker.startRecording(1, 1, 1, 1)
+        except RuntimeError as error:
+            print("ERROR:", error)
+            # the trial is run again when the session is resumed
+            exp.abort_trial()
+            return None
+
+        # Allocate some time for the tracker to cache some samples
+        pylink.pumpDelay(100)
+        gaze_reader.start_trial()
+        gaze_reader.start()
+
+        # show the image; it is scheduled to stay up until the timeout, so a
+        # late blank screen after a timeout is flagged as a dropped frame
+        surf.blit(screen_img, (0, 0))
+        picture_timing = presenter.flip(
+            'picture', presenter.frames_for(cfg.picture_timeout_s * 1000))
+        onset_time = picture_timing.onset  # image onset time
+
+        # the messages of the trial are queued with their time and sent
+        # once the picture is off, the stimulus and the responses never wait
+        # on the link
+        messages = MessageQueue(el_tracker)
+
+        # send over a message to mark the onset of the image
+        messages.message('image_onset', int(onset_time * 1e9))
+
+        # Send a message to clear the Data Viewer screen, get it ready for
+        # drawing the pictures during visualization
+        messages.message('!V CLEAR 128 128 128')
+
+        # send over a message to specify where the image is stored relative
+        # to the EDF data file
+        bg_image = f'rendered_{trial_index}_{pic}'
+        imgload_msg = '!V IMGLOAD CENTER %s %d %d %d %d' % (bg_image,
+                                                            int(scn_width/2.0),
+                                                            int(scn_height/2.0),
+                                                            int(scn_width),
+                                                            int(scn_height))
+        messages.message(imgload_msg)
+
+        # send interest area messages to record in the EDF data file
+        # format: !V IAREA RECTANGLE <id> <left> <top> <right> <bottom> [label]
+        ia_pars = (1, left, top, right, bottom, 'screen_center')
+        messages.message('!V IAREA RECTANGLE %d %d %d %d %d %s' % ia_pars)
+
+        # show the image for picture_timeout_s; break if the SPACEBAR is
+        # pressed
+        pygame.event.clear()  # clear all cached events if there were any
+        RT = -1
+        # the blank screen after a timeout is flipped on time, at the end of
+        # the picture's frames
+        deadline = presenter.next_flip_time(picture_timing)
+        while True:
+            # block until a key press or the timeout
+            response = wait_response(deadline, keys=(K_SPACE, K_ESCAPE, K_c),
+                                     clicks=False)
+            if response.kind == TIMEOUT:
+                messages.message('time_out', response.time_ns)
+                break
+
+            # Stop stimulus presentation when the spacebar is pressed
+            if response.kind == KEY and response.key == K_SPACE:
+                # send over a message to log the key press
+                messages.message('key_pressed', response.time_ns)
+
+                # get response time in ms
+                RT = int(response.rt(onset_time) * 1000)
+                break
+
+            # Terminate the task if ESCAPE or Ctrl-c is pressed, or if the
+            # window is closed; ESCAPE ends the session on every screen
+            if response.kind == ABORT or response.key == K_ESCAPE or \
+                    response.mod in [KMOD_LCTRL, KMOD_RCTRL, 4160, 4224]:
+                messages.message('terminated_by_user', response.time_ns)
+                gaze_reader.stop()
+                messages.flush()
+                exp.terminate_task()
+                return pylink.ABORT_EXPT
+
+        pygame.mouse.set_visible(False)
+        gaze_reader.stop()
+
+        # abort the trial if the tracker stopped recording while the picture
+        # was up
+        error = el_tracker.isRecording()
+        if error is not pylink.TRIAL_OK:
+            messages.flush()
+            el_tracker.sendMessage('tracker_disconnected')
+            exp.abort_trial()
+            return None
+
+        # clear the screen
+        surf.fill((128, 128, 128))
+        blank_timing = presenter.flip('blank')
+        messages.message('blank_screen', int(blank_timing.onset * 1e9))
+        # send a message to clear the Data Viewer screen as well
+        messages.message('!V CLEAR 128 128 128')
+        messages.flush()
+
+        # stop recording; add 100 msec to catch final events before stopping
+        pylink.pumpDelay(100)
+        el_tracker.stopRecording()
+        print(f'({trial_index}) Gaze samples: {len(gaze_reader.trial_samples())}, '
+              f'fixations: {len(gaze_reader.trial_fixations())}')
+        if presenter.timer.dropped:
+            print(f'({trial_index}) {presenter.timer.dropped} dropped frame(s)')
+
+        # record trial variables to the EDF data file, for details, see
+        # Data Viewer User Manual, "Protocol for EyeLink Data to Viewer
+        # Integration"
+        el_tracker.sendMessage('!V TRIAL_VAR condition %s' % cond)
+        el_tracker.sendMessage('!V TRIAL_VAR image %s' % pic)
+        el_tracker.sendMessage('!V TRIAL_VAR RT %d' % RT)
+        el_tracker.sendMessage('!V TRIAL_VAR dropped_frames %d'
+                               % presenter.timer.dropped)
+
+        # send a 'TRIAL_RESULT' message to mark the end of trial
+        el_tracker.sendMessage('TRIAL_RESULT %d' % pylink.TRIAL_OK)
+        return pylink.TRIAL_OK
+
+
+def main(config, argv=None):
+    """ run a session of config, with the command line overrides applied """
+
+    # Switch to the script folder, the media paths are relative to it
+    script_path = os.path.dirname(sys.argv[0])
+    if len(script_path) != 0:
+        os.chdir(script_path)
+
+    try:
+        parse_args(config, argv)
+    except (ValueError, RuntimeError, OSError) as err:
+        print('ERROR:', err)
+        sys.exit(2)
+    Experiment(config).run()
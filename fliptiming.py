@@ -0,0 +1,95 @@
+import time
+
+import pygame
+
+# Timing instrumentation around display flips
+#
+# Every flip is stamped with time.perf_counter_ns() right after it returns,
+# compared with the time it was scheduled for and written to a per-session
+# timing log, so dropped frames can be told apart from genuine slow responses.
+
+
+class FlipRecord(object):
+    """ timing of a single flip
+
+    time: when the flip returned (time.perf_counter() seconds)
+    interval: seconds since the previous flip, None for the first flip
+    late: seconds the flip landed after its scheduled time, None if the flip
+          was not scheduled
+    dropped: True if the flip missed its scheduled refresh
+    """
+
+    def __init__(self, label, time_ns, interval, late, dropped):
+        self.label = label
+        self.time_ns = time_ns
+        self.time = time_ns / 1e9
+        self.interval = interval
+        self.late = late
+        self.dropped = dropped
+
+
+class FlipTimer(object):
+    """ flip the display and log the timing of every flip
+
+    refresh_hz: refresh rate of the display
+    log_path: CSV file to write the flip timing to, no log if None
+    """
+
+    def __init__(self, refresh_hz, log_path=None):
+        self.frame_s = 1.0 / refresh_hz
+        self.trial = 0
+        self.dropped = 0
+        self.last = None
+        self._log = None
+        if log_path is not None:
+            self._log = open(log_path, 'w')
+            self._log.write('trial,label,flip_ns,interval_ms,late_ms,dropped\n')
+
+    def start_trial(self, trial):
+        """ tag the following flips with a new trial number
+
+        the timing of the previous trial is flushed to the log and the count
+        of dropped frames is reset
+        """
+
+        self.trial = trial
+        self.dropped = 0
+        if self._log is not None:
+            self._log.flush()
+
+    def flip(self, label='', expected=None):
+        """ flip the display and return its FlipRecord
+
+        label: what is being shown, for the timing log
+        expected: when the flip should land (time.perf_counter() seconds)
+        """
+
+        pygame.display.flip()
+        t_ns = time.perf_counter_ns()
+
+        interval = None
+        if self.last is not None:
+            interval = (t_ns - self.last.time_ns) / 1e9
+        late = None
+        dropped = False
+        if expected is not None:
+            late = t_ns / 1e9 - expected
+            # more than half a frame late means we missed the refresh
+            dropped = late > self.frame_s / 2
+        record = FlipRecord(label, t_ns, interval, late, dropped)
+        self.last = record
+        if dropped:
+            self.dropped += 1
+
+        if self._log is not None:
+            self._log.write('%d,%s,%d,%s,%s,%d\n' % (
+                self.trial, label, t_ns,
+                '' if interval is None else '%.3f' % (interval * 1000),
+                '' if late is None else '%.3f' % (late * 1000),
+                dropped))
+        return record
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import numpy as np
+
+# Background reader of the link samples and events
+#
+# The scripts record with samples and events over the link, but nothing
+# read them. A GazeReader thread drains getNextData()/getFloatData() into
+# ring buffers (NumPy structured arrays allocated once), so the gaze of the
+# running trial is available live, e.g., for gaze-contingent hit detection,
+# and as per-trial arrays once the trial is over.
+
+SAMPLE_DTYPE = np.dtype([('time', 'i8'), ('x', 'f4'), ('y', 'f4'),
+                         ('pupil', 'f4')])
+FIXATION_DTYPE = np.dtype([('start', 'i8'), ('end', 'i8'), ('x', 'f4'),
+                           ('y', 'f4')])
+
+# link data types of pylink.getNextData()
+STARTFIX = 7
+ENDFIX = 8
+SAMPLE_TYPE = 200
+
+# how long to sleep when the link queue is empty (in seconds)
+POLL_S = 0.001
+
+
+class RingBuffer(object):
+    """ fixed-size ring buffer of records
+
+    capacity: the number of records kept, older records get overwritten
+    dtype: the NumPy dtype of a record
+    """
+
+    def __init__(self, capacity, dtype):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        # total number of records written, the next one goes to
+        # count % capacity
+        self.count = 0
+
+    def append(self, *values):
+        self.data[self.count % self.capacity] = values
+        self.count += 1
+
+    def since(self, start):
+        """ return a copy of the records written since count was start
+
+        records overwritten in the meantime are lost
+        """
+
+        end = self.count
+        start = max(start, end - self.capacity)
+        i, j = start % self.capacity, end % self.capacity
+        if end - start == 0:
+            return self.data[:0].copy()
+        if i < j:
+            return self.data[i:j].copy()
+        return np.concatenate((self.data[i:], self.data[:j]))
+
+    def last(self):
+        """ return the last record, None if nothing was written """
+
+        if self.count == 0:
+            return None
+        return self.data[(self.count - 1) % self.capacity]
+
+
+class GazeReader(object):
+    """ drain the link samples and fixation events on a background thread
+
+    tracker: the EyeLink connection
+    seconds: how much gaze the sample buffer holds at rate Hz
+    rate: the sampling rate of the tracker (in Hz)
+    """
+
+    def __init__(self, tracker, seconds=60, rate=1000):
+        self.tracker = tracker
+        self.samples = RingBuffer(int(seconds * rate), SAMPLE_DTYPE)
+        self.fixations = RingBuffer(max(1, int(seconds * 10)), FIXATION_DTYPE)
+        self._fixation = None
+        self._trial_samples = 0
+        self._trial_fixations = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def start_trial(self):
+        """ start collecting the samples and fixations of a new trial """
+
+        self._trial_samples = self.samples.count
+        self._trial_fixations = self.fixations.count
+        self._fixation = None
+
+    def trial_samples(self):
+        """ return the samples of the current trial (SAMPLE_DTYPE array) """
+
+        return self.samples.since(self._trial_samples)
+
+    def trial_fixations(self):
+        """ return the completed fixations of the current trial """
+
+        return self.fixations.since(self._trial_fixations)
+
+    def current_fixation(self):
+        """ return (start time, x, y) of the ongoing fixation, None if the
+        eyes are not fixating
+        """
+
+        return self._fixation
+
+    def newest_sample(self):
+        """ return the newest sample record, None before the first one """
+
+        return self.samples.last()
+
+    def _run(self):
+        tracker = self.tracker
+        while self._running:
+            data_type = tracker.getNextData()
+            if not data_type:
+                time.sleep(POLL_S)
+                continue
+            item = tracker.getFloatData()
+            if item is None:
+                continue
+            if data_type == SAMPLE_TYPE:
+                if item.isRightSample():
+                    eye = item.getRightEye()
+                elif item.isLeftSample():
+                    eye = item.getLeftEye()
+                else:
+                    continue
+                x, y = eye.getGaze()
+                self.samples.append(item.getTime(), x, y, eye.getPupilSize())
+            elif data_type == STARTFIX:
+                x, y = item.getStartGaze()
+                self._fixation = (item.getStartTime(), x, y)
+            elif data_type == ENDFIX:
+                x, y = item.getAverageGaze()
+                self.fixations.append(item.getStartTime(), item.getEndTime(),
+                                      x, y)
+                self._fixation = None
@@ -0,0 +1,69 @@
+import pygame
+
+# Ground truth masks as thresholded bitmaps
+#
+# The gt*.jpg masks are JPEG compressed, so the target is not exactly white
+# (255, 255, 255) along its edges. Each mask is thresholded once into a
+# pygame.mask.Mask, in the coordinates of the stimulus it belongs to, and a
+# click is then checked with a single bit lookup.
+
+# mask pixels at least this bright (on every channel) belong to the target
+MASK_THRESHOLD = 128
+
+
+def disc_mask(radius):
+    """ return a Mask holding a filled disc of the given radius """
+
+    size = 2 * radius + 1
+    disc = pygame.mask.Mask((size, size))
+    for x in range(size):
+        for y in range(size):
+            if (x - radius) ** 2 + (y - radius) ** 2 <= radius ** 2:
+                disc.set_at((x, y))
+    return disc
+
+
+class TargetMask(object):
+    """ target region of a stimulus, for click hit testing
+
+    mask: pygame.mask.Mask of the target pixels, in stimulus coordinates
+    tolerance: clicks up to this many pixels away from the target are hits
+    """
+
+    def __init__(self, mask, tolerance=0):
+        self.size = mask.get_size()
+        self.tolerance = tolerance
+        if tolerance > 0:
+            # dilate the target once, so a hit test stays a single lookup;
+            # the dilated mask is shifted by the tolerance on both axes
+            mask = mask.convolve(disc_mask(tolerance))
+        self.mask = mask
+
+    @classmethod
+    def from_surface(cls, surf, tolerance=0, threshold=MASK_THRESHOLD):
+        """ threshold a decoded gt mask image into a TargetMask """
+
+        level = 256 - threshold
+        mask = pygame.mask.from_threshold(surf, (255, 255, 255),
+                                          (level, level, level, 255))
+        return cls(mask, tolerance)
+
+    def nbytes(self):
+        """ approximate memory held by the bitmap (one bit per pixel) """
+
+        w, h = self.mask.get_size()
+        return w * h // 8
+
+    def hit(self, pos, topleft):
+        """ return True if a screen position falls on the target
+
+        pos: the (x, y) screen position, e.g., a mouse click
+        topleft: the screen position of the top left corner of the stimulus
+        """
+
+        x = pos[0] - topleft[0] + self.tolerance
+        y = pos[1] - topleft[1] + self.tolerance
+        w, h = self.mask.get_size()
+        if 0 <= x < w and 0 <= y < h:
+            return bool(self.mask.get_at((x, y)))
+        return False
@@ -0,0 +1,282 @@
+import json
+import math
+import os
+
+import pygame
+
+from gtmask import MASK_THRESHOLD, TargetMask
+
+# Interest areas from the ground truth masks
+#
+# The target of every image is turned into an interest area once: the
+# bounding box of the mask and the outline polygon of each of its parts.
+# They are written to a JSON cache next to the masks (checked against the
+# mask's mtime and size) and sent as !V IAREA messages, so Data Viewer shows
+# the real target instead of a hardcoded rectangle. The outlines are
+# simplified (Douglas-Peucker) until each message fits in what the tracker
+# keeps of a message.
+#
+# Online, a TargetFixations follows the fixations of the GazeReader: a
+# fixation is on the target if it falls in the bounding box and on a mask
+# pixel, two O(1) tests.
+
+# parts of the mask smaller than this (in pixels) are JPEG noise
+MIN_PART_PIXELS = 16
+
+# keep every n-th point of the outlines
+OUTLINE_EVERY = 4
+
+# the longest message the tracker keeps whole; the outlines are simplified
+# until their IAREA message fits, with room for the MessageQueue offset
+MAX_MESSAGE_CHARS = 240
+
+
+def simplify_line(points, tolerance):
+    """ simplify a polyline (Douglas-Peucker), keeping its end points
+
+    tolerance: points closer than this to the simplified line are dropped
+    """
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x0, y0), (x1, y1) = points[first], points[last]
+        dx, dy = x1 - x0, y1 - y0
+        length = math.hypot(dx, dy)
+        farthest, index = 0.0, None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length:
+                dist = abs(dy * (x - x0) - dx * (y - y0)) / length
+            else:
+                dist = math.hypot(x - x0, y - y0)
+            if dist > farthest:
+                farthest, index = dist, i
+        if index is not None and farthest > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+def simplify_polygon(points, tolerance):
+    """ simplify a closed outline, split at its point farthest from the
+    first one
+    """
+
+    if len(points) <= 3:
+        return list(points)
+    x0, y0 = points[0]
+    split = max(range(len(points)),
+                key=lambda i: math.hypot(points[i][0] - x0, points[i][1] - y0))
+    return (simplify_line(points[:split + 1], tolerance)[:-1] +
+            simplify_line(points[split:] + [points[0]], tolerance)[:-1])
+
+
+class InterestArea(object):
+    """ the target of an image, in the coordinates of the image
+
+    bbox: (left, top, right, bottom) of the target, None if the mask is empty
+    polygons: the outline of each part of the target, lists of (x, y)
+    """
+
+    def __init__(self, bbox, polygons):
+        self.bbox = tuple(bbox) if bbox is not None else None
+        self.polygons = [[tuple(p) for p in poly] for poly in polygons]
+
+    @classmethod
+    def from_mask(cls, mask):
+        """ compute the interest area of a pygame.mask.Mask """
+
+        parts = mask.connected_components(MIN_PART_PIXELS)
+        if not parts:
+            return cls(None, [])
+        rects = [part.get_bounding_rects()[0] for part in parts]
+        bbox = rects[0].unionall(rects[1:])
+        polygons = [part.outline(OUTLINE_EVERY) for part in parts]
+        return cls((bbox.left, bbox.top, bbox.right, bbox.bottom),
+                   [poly for poly in polygons if len(poly) >= 3])
+
+    def scaled(self, scale):
+        """ return the interest area of the image resized by scale """
+
+        if self.bbox is None or scale == 1:
+            return self
+        bbox = [int(round(v * scale)) for v in self.bbox]
+        polygons = [[(int(round(x * scale)), int(round(y * scale)))
+                     for x, y in poly] for poly in self.polygons]
+        return InterestArea(bbox, polygons)
+
+    def contains(self, pos, topleft):
+        """ return True if a screen position is in the bounding box
+
+        pos: the (x, y) screen position
+        topleft: the screen position of the top left corner of the image
+        """
+
+        if self.bbox is None:
+            return False
+        x = pos[0] - topleft[0]
+        y = pos[1] - topleft[1]
+        left, top, right, bottom = self.bbox
+        return left <= x < right and top <= y < bottom
+
+    def iarea_messages(self, topleft, label='target'):
+        """ return the !V IAREA messages of the target on the screen
+
+        topleft: the screen position of the top left corner of the image
+
+        each outline is simplified until its message is at most
+        MAX_MESSAGE_CHARS long; outlines left with fewer than 3 points are
+        dropped, the rectangle still covers them
+        """
+
+        if self.bbox is None:
+            return []
+        dx, dy = topleft
+        left, top, right, bottom = self.bbox
+        messages = ['!V IAREA RECTANGLE 1 %d %d %d %d %s' % (
+            left + dx, top + dy, right + dx, bottom + dy, label)]
+        for poly in self.polygons:
+            tolerance = 0.5
+            while True:
+                points = simplify_polygon(poly, tolerance)
+                msg = '!V IAREA FREEHAND %d %s %s_%d' % (
+                    len(messages) + 1,
+                    ' '.join('%d,%d' % (x + dx, y + dy) for x, y in points),
+                    label, len(messages))
+                if len(msg) <= MAX_MESSAGE_CHARS or len(points) < 3:
+                    break
+                tolerance *= 2
+            if len(points) >= 3:
+                messages.append(msg)
+        return messages
+
+
+class InterestAreaCache(object):
+    """ interest areas of the gt masks, cached on disk
+
+    cache_dir: folder holding the cached interest areas
+    threshold: mask pixels at least this bright belong to the target
+    """
+
+    def __init__(self, cache_dir, threshold=MASK_THRESHOLD):
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self._areas = {}
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get(self, mask_path):
+        """ return the InterestArea of a gt mask image """
+
+        if mask_path in self._areas:
+            return self._areas[mask_path]
+
+        st = os.stat(mask_path)
+        stamp = [st.st_mtime_ns, st.st_size, self.threshold]
+        cache_path = os.path.join(self.cache_dir,
+                                  os.path.basename(mask_path) + '.json')
+        area = None
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached['stamp'] == stamp:
+                area = InterestArea(cached['bbox'], cached['polygons'])
+        if area is None:
+            surf = pygame.image.load(mask_path)
+            mask = TargetMask.from_surface(surf, 0, self.threshold).mask
+            area = InterestArea.from_mask(mask)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'stamp': stamp, 'bbox': area.bbox,
+                           'polygons': area.polygons}, f)
+            os.replace(tmp_path, cache_path)
+
+        self._areas[mask_path] = area
+        return area
+
+    def preload(self, mask_paths):
+        """ load (or compute) the interest areas of gt masks ahead of time """
+
+        for mask_path in mask_paths:
+            self.get(mask_path)
+
+    def lookup(self, mask_path):
+        """ return the InterestArea of a preloaded gt mask, from memory """
+
+        return self._areas[mask_path]
+
+
+class TargetFixations(object):
+    """ follow the fixations on the target while the search screen is up
+
+    reader: the GazeReader of the link
+    area: the InterestArea of the target
+    mask: the gt mask (gtmask.TargetMask or maskstore.PackedMask)
+    topleft: the screen position of the top left corner of the stimulus
+    """
+
+    def __init__(self, reader, area, mask, topleft):
+        self.reader = reader
+        self.area = area
+        self.mask = mask
+        self.topleft = topleft
+        self.onset = None
+        self.first_fixation = None
+        self._seen = reader.fixations.count
+
+    def start(self):
+        """ mark the onset of the search screen on the tracker clock """
+
+        sample = self.reader.newest_sample()
+        if sample is not None:
+            self.onset = int(sample['time'])
+        self._seen = self.reader.fixations.count
+
+    def on_target(self, x, y):
+        pos = (int(x), int(y))
+        return (self.area.contains(pos, self.topleft) and
+                self.mask.hit(pos, self.topleft))
+
+    def update(self):
+        """ check the new fixations, return how long (ms) the eyes have been
+        fixating the target, 0 if they are not on it
+        """
+
+        # fixations that ended since the last update
+        count = self.reader.fixations.count
+        if count != self._seen:
+            for start, end, x, y in self.reader.fixations.since(self._seen):
+                if self.first_fixation is None and self.on_target(x, y):
+                    self.first_fixation = int(start)
+            self._seen = count
+
+        fixation = self.reader.current_fixation()
+        if fixation is None:
+            return 0
+        start, x, y = fixation
+        if not self.on_target(x, y):
+            return 0
+        if self.first_fixation is None:
+            self.first_fixation = start
+        # the dwell counts from the onset if the fixation started before it
+        if self.onset is not None:
+            start = max(start, self.onset)
+        sample = self.reader.newest_sample()
+        if sample is None:
+            return 0
+        return max(0, int(sample['time']) - start)
+
+    def time_to_first_fixation(self):
+        """ return the time (ms) from the onset to the first fixation on the
+        target, None if there was none
+
+        a fixation already on the target at the onset counts from the onset
+        """
+
+        if self.onset is None or self.first_fixation is None:
+            return None
+        return max(0, self.first_fixation - self.onset)
@@ -0,0 +1,47 @@
+import time
+
+# Deferred EyeLink messages
+#
+# sendMessage() waits for the link, which is not something to do right after
+# a stimulus flip. Messages are queued with a local timestamp instead and
+# sent in a batch when the trial is idle; each one is prefixed with its age
+# in ms ("<offset> message"). The EDF keeps the time the message was
+# received with the offset in the text; Data Viewer and ascparse subtract
+# it to get the time of the event.
+
+
+class MessageQueue(object):
+    """ queue EyeLink messages and send them later with a time offset
+
+    tracker: the EyeLink connection, e.g., pylink.getEYELINK()
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self._pending = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    def message(self, msg, t_ns=None):
+        """ queue a message
+
+        msg: the message text
+        t_ns: when the event happened (time.perf_counter_ns()), now if None
+        """
+
+        if t_ns is None:
+            t_ns = time.perf_counter_ns()
+        self._pending.append((t_ns, msg))
+
+    def flush(self):
+        """ send the queued messages, oldest first """
+
+        pending = self._pending
+        self._pending = []
+        for t_ns, msg in pending:
+            # the offset is taken per message, sending each one takes time
+            offset = (time.perf_counter_ns() - t_ns) // 1000000
+            if offset > 0:
+                msg = '%d %s' % (offset, msg)
+            self.tracker.sendMessage(msg)
@@ -0,0 +1,220 @@
+import argparse
+import mmap
+import os
+import re
+import struct
+
+# Bit-packed store of the ground truth masks
+#
+# All gt*.jpg masks are thresholded once and packed into a single file, one
+# bit per pixel, which the experiment memory-maps; looking up a mask bit is
+# then a byte read from the page cache instead of a JPEG decode.
+#
+# Each mask keeps the mtime and size of its gt*.jpg: a mask whose source
+# changed after the store was built is not served from the store. With a
+# hit tolerance, a mask is dilated once when it is looked up, so a hit test
+# stays a single bit read.
+#
+# File layout (little endian):
+#   header: magic b'GTMASK02', number of masks (uint32)
+#   index:  per mask, image index, width, height (uint32), the offset of
+#           its bits in the file (uint64) and the mtime (ns, int64) and size
+#           (uint64) of its source image
+#   data:   per mask, rows of ceil(width / 8) bytes, most significant bit
+#           first, which is the layout of a PIL mode '1' image
+
+MAGIC = b'GTMASK02'
+HEADER = struct.Struct('<8sI')
+INDEX_ENTRY = struct.Struct('<IIIQqQ')
+
+# mask pixels at least this bright (on every channel) belong to the target
+MASK_THRESHOLD = 128
+
+MASK_NAME = re.compile(r'^gt(\d+)\.jpg$')
+
+
+def mask_file(mask_dir, idx):
+    """ return the path of the gt mask of image index idx """
+
+    return os.path.join(mask_dir, 'gt%d.jpg' % idx)
+
+
+def pack_mask(path, threshold=MASK_THRESHOLD):
+    """ threshold a gt mask image and return (width, height, packed bits) """
+
+    from PIL import Image
+
+    img = Image.open(path).convert('RGB')
+    return img.width, img.height, pack_mask_image(img, threshold)
+
+
+def pack_mask_image(img, threshold=MASK_THRESHOLD):
+    """ threshold an RGB PIL image and return its packed bits """
+
+    from PIL import ImageChops
+
+    r, g, b = img.split()
+    darkest = ImageChops.darker(ImageChops.darker(r, g), b)
+    bits = darkest.point(lambda v: 255 if v >= threshold else 0, mode='1')
+    return bits.tobytes()
+
+
+def build_mask_store(mask_dir, store_path, threshold=MASK_THRESHOLD):
+    """ pack every gt<idx>.jpg mask in mask_dir into a single store file
+
+    returns the number of masks in the store
+    """
+
+    masks = []
+    for fname in os.listdir(mask_dir):
+        match = MASK_NAME.match(fname)
+        if match:
+            masks.append((int(match.group(1)), os.path.join(mask_dir, fname)))
+    masks.sort()
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(masks)
+    index = []
+    data = []
+    for idx, path in masks:
+        st = os.stat(path)
+        width, height, bits = pack_mask(path, threshold)
+        index.append(INDEX_ENTRY.pack(idx, width, height, offset,
+                                      st.st_mtime_ns, st.st_size))
+        data.append(bits)
+        offset += len(bits)
+
+    # write to a temporary file first, a running session may have the old
+    # store mapped
+    tmp_path = store_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(masks)))
+        f.writelines(index)
+        f.writelines(data)
+    os.replace(tmp_path, store_path)
+    return len(masks)
+
+
+class PackedMask(object):
+    """ a single mask of a MaskStore, for click hit testing
+
+    has the same hit() interface as gtmask.TargetMask; with a tolerance,
+    the mask is dilated into a TargetMask once, here
+    """
+
+    def __init__(self, buf, width, height, offset, tolerance=0):
+        self.size = (width, height)
+        self.tolerance = tolerance
+        self._buf = buf
+        self._offset = offset
+        self._stride = (width + 7) // 8
+        self._dilated = None
+        if tolerance > 0:
+            from gtmask import TargetMask
+            self._dilated = TargetMask(self.to_mask(), tolerance)
+
+    def to_mask(self):
+        """ return the mask as a pygame.mask.Mask """
+
+        import numpy as np
+        import pygame
+
+        width, height = self.size
+        bits = np.frombuffer(self._buf, np.uint8, self._stride * height,
+                             self._offset).reshape(height, self._stride)
+        pixels = np.unpackbits(bits, axis=1)[:, :width] * np.uint8(255)
+        surf = pygame.image.frombuffer(np.repeat(pixels, 3).tobytes(),
+                                       self.size, 'RGB')
+        return pygame.mask.from_threshold(surf, (255, 255, 255),
+                                          (1, 1, 1, 255))
+
+    def get_at(self, x, y):
+        """ return True if pixel (x, y) of the mask belongs to the target """
+
+        width, height = self.size
+        if not (0 <= x < width and 0 <= y < height):
+            return False
+        byte = self._buf[self._offset + y * self._stride + (x >> 3)]
+        return bool(byte & (0x80 >> (x & 7)))
+
+    def hit(self, pos, topleft):
+        """ return True if a screen position falls on the target
+
+        pos: the (x, y) screen position, e.g., a mouse click
+        topleft: the screen position of the top left corner of the stimulus
+        """
+
+        if self._dilated is not None:
+            return self._dilated.hit(pos, topleft)
+        return self.get_at(pos[0] - topleft[0], pos[1] - topleft[1])
+
+
+class MaskStore(object):
+    """ memory-mapped store of bit-packed gt masks
+
+    store_path: the file written by build_mask_store()
+    mask_dir: the folder of the gt masks the store was built from
+    """
+
+    def __init__(self, store_path, mask_dir=None):
+        self.mask_dir = mask_dir
+        self._file = open(store_path, 'rb')
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise RuntimeError('%s is not a gt mask store, or an old one; '
+                               'build it again' % store_path)
+        self._index = {}
+        for i in range(count):
+            entry = INDEX_ENTRY.unpack_from(
+                self._buf, HEADER.size + i * INDEX_ENTRY.size)
+            self._index[entry[0]] = entry[1:]
+
+    def __contains__(self, idx):
+        return idx in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def check(self):
+        """ drop the masks whose source image changed or is gone
+
+        returns the image indices of the dropped masks
+        """
+
+        stale = []
+        for idx, (width, height, offset, mtime_ns, size) in \
+                self._index.items():
+            try:
+                st = os.stat(mask_file(self.mask_dir, idx))
+            except OSError:
+                stale.append(idx)
+                continue
+            if st.st_mtime_ns != mtime_ns or st.st_size != size:
+                stale.append(idx)
+        for idx in stale:
+            del self._index[idx]
+        return stale
+
+    def lookup(self, idx, tolerance=0):
+        """ return the PackedMask of image index idx """
+
+        width, height, offset = self._index[idx][:3]
+        return PackedMask(self._buf, width, height, offset, tolerance)
+
+    def close(self):
+        self._buf.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Pack the gt*.jpg masks into a single bit-packed file')
+    parser.add_argument('mask_dir', help='folder holding the gt masks')
+    parser.add_argument('store_path', help='mask store file to write')
+    parser.add_argument('--threshold', type=int, default=MASK_THRESHOLD,
+                        help='brightness from which a pixel is on the target')
+    args = parser.parse_args()
+
+    n = build_mask_store(args.mask_dir, args.store_path, args.threshold)
+    print('Packed %d masks into %s' % (n, args.store_path))
@@ -0,0 +1,391 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from maskstore import MASK_THRESHOLD, PackedMask, pack_mask_image
+
+# Media bundle of the search task
+#
+# "python mediabundle.py media" (prepare-media) decodes every image of the
+# media folder once, in a process pool, resizes it for the display the
+# session runs on and packs the raw pixels into a single file with an
+# index. The experiment memory-maps the bundle: a trial's images are
+# surfaces over slices of the mapping (pygame.image.frombuffer), so no JPEG
+# is decoded during the session, and the gt masks are bit-packed like in
+# the MaskStore.
+#
+# The pixels are stored in the 32-bit layout of the display's window (BGRA
+# for the usual XRGB8888 window of a little endian PC): the surfaces over
+# the mapping then blit like convert()-ed ones and are drawn straight from
+# the page cache, without a converted copy of each image in memory.
+#
+# Images larger than the display are scaled down to fit it, keeping their
+# aspect ratio; a gt mask gets the scale of its stimulus (same size), so the
+# two stay aligned. Assets whose source file changed after the bundle was
+# written are not served from it.
+#
+# File layout (little endian):
+#   header:   magic b'MEDIA002', offset and length (uint64) of the manifest
+#   data:     the assets, each at a 64-byte aligned offset; images as rows
+#             of pixels in the pixel format of the bundle, masks as rows of
+#             ceil(width / 8) bytes, most significant bit first
+#   manifest: JSON: the display size, the pixel format of the images
+#             (a pygame.image.frombuffer() format), and per asset its name
+#             (path in the media folder), kind ('image' or 'mask'), size,
+#             source size, scale, offset, length and the mtime/size of its
+#             source file
+
+MAGIC = b'MEDIA002'
+HEADER = struct.Struct('<8sQQ')
+ALIGN = 64
+
+# the media folders packed into the bundle, and what their images are
+MEDIA_FOLDERS = (('backgrounds', 'image'), ('targets', 'image'),
+                 ('stimuli', 'image'), ('gt', 'mask'))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+BUNDLE_NAME = 'media.bundle'
+
+# the 32-bit pixel formats the images can be stored in (see window_format())
+PIXEL_FORMATS = ('BGRA', 'RGBX', 'ARGB')
+PIXEL_FORMAT = 'BGRA'
+
+
+def format_masks(pixel_format):
+    """ return the (red, green, blue) masks of a 32-bit pixel format """
+
+    masks = []
+    for channel in 'RGB':
+        i = pixel_format.index(channel)
+        if sys.byteorder == 'big':
+            i = 3 - i
+        masks.append(0xff << (8 * i))
+    return tuple(masks)
+
+
+def window_format(bytesize, masks):
+    """ return the pixel format with the layout of a display's pixels
+
+    bytesize, masks: of the window surface (or pygame.display.Info())
+    returns None if no 32-bit format matches
+    """
+
+    if bytesize != 4:
+        return None
+    for pixel_format in PIXEL_FORMATS:
+        if format_masks(pixel_format) == tuple(masks[:3]):
+            return pixel_format
+    return None
+
+
+def fit_scale(size, display_size, upscale=False):
+    """ return the factor scaling size to fit in display_size """
+
+    scale = min(display_size[0] / size[0], display_size[1] / size[1])
+    if not upscale:
+        scale = min(scale, 1.0)
+    return scale
+
+
+def find_assets(media_dir):
+    """ return the (name, kind) of the images of the media folders """
+
+    assets = []
+    for folder, kind in MEDIA_FOLDERS:
+        path = os.path.join(media_dir, folder)
+        if not os.path.isdir(path):
+            continue
+        for fname in sorted(os.listdir(path)):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                assets.append((folder + '/' + fname, kind))
+    return assets
+
+
+def prepare_asset(job):
+    """ worker: decode and resize an asset, return its entry and its data
+
+    job: (media_dir, name, kind, display_size, upscale, threshold,
+          pixel_format)
+    """
+
+    (media_dir, name, kind, display_size, upscale, threshold,
+     pixel_format) = job
+    path = os.path.join(media_dir, name)
+    st = os.stat(path)
+    img = pygame.image.load(path)
+    source_size = img.get_size()
+    scale = fit_scale(source_size, display_size, upscale)
+    size = (max(1, int(round(source_size[0] * scale))),
+            max(1, int(round(source_size[1] * scale))))
+
+    if kind == 'mask':
+        # no smoothing, the edges of the target stay where they are
+        if size != source_size:
+            img = pygame.transform.scale(img, size)
+        from PIL import Image
+        rgb = Image.frombytes('RGB', size, pygame.image.tostring(img, 'RGB'))
+        data = pack_mask_image(rgb, threshold)
+    else:
+        if size != source_size:
+            if img.get_bitsize() < 24:
+                # smoothscale() needs 24 or 32 bit pixels
+                img = pygame.image.frombuffer(
+                    pygame.image.tostring(img, 'RGB'), source_size, 'RGB')
+            img = pygame.transform.smoothscale(img, size)
+        data = pygame.image.tostring(img, pixel_format)
+
+    entry = {'name': name, 'kind': kind, 'size': list(size),
+             'source_size': list(source_size), 'scale': scale,
+             'length': len(data), 'mtime_ns': st.st_mtime_ns,
+             'file_size': st.st_size}
+    return entry, data
+
+
+def prepare_media(media_dir, display_size, bundle_path=None, workers=None,
+                  upscale=False, threshold=MASK_THRESHOLD,
+                  pixel_format=PIXEL_FORMAT):
+    """ pack the images of media_dir into a bundle for display_size
+
+    pixel_format: layout of the image pixels, best the one of the window
+    (see window_format())
+
+    returns the number of assets in the bundle
+    """
+
+    if bundle_path is None:
+        bundle_path = os.path.join(media_dir, BUNDLE_NAME)
+    display_size = tuple(display_size)
+    jobs = [(media_dir, name, kind, display_size, upscale, threshold,
+             pixel_format)
+            for name, kind in find_assets(media_dir)]
+
+    entries = []
+    # write to a temporary file first, a running session may have the old
+    # bundle mapped
+    tmp_path = bundle_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        offset = HEADER.size
+        with ProcessPoolExecutor(workers) as pool:
+            for entry, data in pool.map(prepare_asset, jobs, chunksize=4):
+                pad = -offset % ALIGN
+                f.write(bytes(pad))
+                offset += pad
+                entry['offset'] = offset
+                f.write(data)
+                offset += len(data)
+                entries.append(entry)
+
+        manifest = json.dumps({'display_size': list(display_size),
+                               'pixel_format': pixel_format,
+                               'assets': entries}).encode()
+        f.write(manifest)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, offset, len(manifest)))
+    os.replace(tmp_path, bundle_path)
+    return len(entries)
+
+
+class MediaBundle(object):
+    """ memory-mapped media bundle
+
+    bundle_path: the file written by prepare_media()
+    media_dir: the media folder the bundle was prepared from
+    """
+
+    def __init__(self, bundle_path, media_dir):
+        self.media_dir = media_dir
+        # the surfaces over the mapping, made once per image
+        self._surfaces = {}
+        self._file = open(bundle_path, 'rb')
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, offset, length = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise RuntimeError('%s is not a media bundle, or an old one; '
+                               'prepare it again' % bundle_path)
+        manifest = json.loads(self._buf[offset:offset + length])
+        self.display_size = tuple(manifest['display_size'])
+        self.pixel_format = manifest['pixel_format']
+        self._assets = dict((entry['name'], entry)
+                            for entry in manifest['assets'])
+
+    def name(self, path):
+        """ return the name in the bundle of an image path """
+
+        rel = os.path.relpath(path, self.media_dir)
+        return rel.replace(os.sep, '/')
+
+    def __contains__(self, path):
+        return self.name(path) in self._assets
+
+    def __len__(self):
+        return len(self._assets)
+
+    def check(self):
+        """ drop the assets whose source file changed or is gone
+
+        returns the names of the dropped assets
+        """
+
+        stale = []
+        for name, entry in self._assets.items():
+            try:
+                st = os.stat(os.path.join(self.media_dir, name))
+            except OSError:
+                stale.append(name)
+                continue
+            if st.st_mtime_ns != entry['mtime_ns'] or \
+                    st.st_size != entry['file_size']:
+                stale.append(name)
+        for name in stale:
+            del self._assets[name]
+            self._surfaces.pop(name, None)
+        return stale
+
+    def entry(self, path):
+        """ return the manifest entry of an image path """
+
+        return self._assets[self.name(path)]
+
+    def scale(self, path):
+        """ return the factor the image at path was resized by """
+
+        return self.entry(path)['scale']
+
+    def view(self, path):
+        """ return the pixels of an image as a slice of the mapping """
+
+        entry = self.entry(path)
+        offset = entry['offset']
+        return memoryview(self._buf)[offset:offset + entry['length']]
+
+    def native(self, win):
+        """ return True if the images have the pixel layout of the window
+        win, so their surfaces blit without being converted
+        """
+
+        return self.pixel_format == window_format(win.get_bytesize(),
+                                                  win.get_masks())
+
+    def surface(self, path):
+        """ return a surface over the pixels of an image (no copy)
+
+        the surface is made once and returned again on the next calls
+        """
+
+        name = self.name(path)
+        surf = self._surfaces.get(name)
+        if surf is None:
+            entry = self._assets[name]
+            surf = pygame.image.frombuffer(self.view(path),
+                                           tuple(entry['size']),
+                                           self.pixel_format)
+            if len(self.pixel_format) == 4:
+                # the 4th byte is padding, not an alpha channel to blend
+                surf.set_alpha(None)
+            self._surfaces[name] = surf
+        return surf
+
+    def mask(self, path, tolerance=0):
+        """ return the PackedMask of a gt mask """
+
+        entry = self.entry(path)
+        width, height = entry['size']
+        return PackedMask(self._buf, width, height, entry['offset'], tolerance)
+
+    def close(self):
+        self._surfaces.clear()
+        try:
+            self._buf.close()
+        except BufferError:
+            # surfaces still in use hold exports of the mapping, it is
+            # unmapped once they are gone
+            pass
+        self._file.close()
+
+
+def open_bundle(media_dir, display_size, win=None):
+    """ return the MediaBundle of media_dir, None if there is none or it was
+    prepared for another display
+
+    win: the window surface, to tell if the images can be blitted without
+         being converted
+    """
+
+    bundle_path = os.path.join(media_dir, BUNDLE_NAME)
+    if not os.path.exists(bundle_path):
+        return None
+    try:
+        bundle = MediaBundle(bundle_path, media_dir)
+    except RuntimeError as err:
+        print('ERROR: %s; loading the images instead' % err)
+        return None
+    if bundle.display_size != tuple(display_size):
+        print('Media bundle prepared for %dx%d, the display is %dx%d; '
+              'loading the images instead' % (bundle.display_size +
+                                              tuple(display_size)))
+        bundle.close()
+        return None
+    stale = bundle.check()
+    if stale:
+        print('%d image(s) changed since the media bundle was prepared, '
+              'loading them instead' % len(stale))
+    if win is not None and not bundle.native(win):
+        print('Media bundle images are %s, the window is not; converting '
+              'them (prepare the media again to skip this)'
+              % bundle.pixel_format)
+    return bundle
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='prepare-media: resize the media for a display and pack '
+                    'them into a memory-mappable bundle')
+    parser.add_argument('media_dir', nargs='?', default='media',
+                        help='folder holding the media folders')
+    parser.add_argument('--out', default=None,
+                        help='bundle to write, <media_dir>/%s by default'
+                             % BUNDLE_NAME)
+    parser.add_argument('--display', type=int, default=0,
+                        help='display to detect the resolution of')
+    parser.add_argument('--size', default=None,
+                        help='display resolution, e.g., 1920x1080')
+    parser.add_argument('--upscale', action='store_true',
+                        help='also scale up the images smaller than the display')
+    parser.add_argument('--threshold', type=int, default=MASK_THRESHOLD,
+                        help='brightness from which a mask pixel is on the target')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--format', default=None, choices=PIXEL_FORMATS,
+                        help='pixel format of the images, the one of the '
+                             'display by default')
+    args = parser.parse_args()
+
+    display_size = None
+    pixel_format = args.format
+    if args.size is not None:
+        display_size = tuple(int(v) for v in args.size.split('x'))
+    if display_size is None or pixel_format is None:
+        pygame.display.init()
+        if display_size is None:
+            display_size = pygame.display.get_desktop_sizes()[args.display]
+        if pixel_format is None:
+            info = pygame.display.Info()
+            pixel_format = window_format(info.bytesize, info.masks)
+            if pixel_format is None:
+                print('The display is not 32-bit, the images are stored as '
+                      '%s and converted at run time' % PIXEL_FORMAT)
+                pixel_format = PIXEL_FORMAT
+        pygame.display.quit()
+
+    n = prepare_media(args.media_dir, display_size, args.out, args.workers,
+                      args.upscale, args.threshold, pixel_format)
+    print('Packed %d images for %dx%d (%s)'
+          % ((n,) + tuple(display_size) + (pixel_format,)))
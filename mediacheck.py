@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from mediapaths import trial_image_paths
+
+# Media check before a session
+#
+# The trial loop builds the image paths of a trial on the fly, so a missing
+# or corrupt image only showed up as a crash in the middle of a session,
+# after the calibration. Every image a session will show, as listed by its
+# trial schedule, is now checked before the EDF file is opened: it must
+# exist and its header must decode (PIL reads the header only, not the
+# pixels), and a gt mask must have the size of its stimulus, since clicks
+# are hit-tested on the mask at the position of the stimulus.
+#
+# The headers are read on a thread pool (the check is mostly file system
+# waits) and their result is cached next to the media by mtime and size, so
+# a session on unchanged media only stats its files.
+
+CACHE_NAME = '.mediacheck.json'
+
+
+def read_header(path):
+    """ return (mtime_ns, size, width, height, error) of an image file
+
+    error is None if the header decodes, width and height are then the
+    image size
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None, None, None, 'missing'
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            width, height = img.size
+            img.verify()
+    except Exception as err:
+        return st.st_mtime_ns, st.st_size, None, None, \
+            'cannot decode (%s)' % err
+    return st.st_mtime_ns, st.st_size, width, height, None
+
+
+def read_headers(paths, cache_path=None, workers=None):
+    """ return {path: (width, height, error)} of image files
+
+    cache_path: JSON file keeping the headers read by earlier checks, only
+                the files whose mtime or size changed are read again
+    workers: number of threads reading the headers
+    """
+
+    cached = {}
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+        except ValueError:
+            cached = {}
+
+    results = {}
+    pending = []
+    for path in sorted(set(paths)):
+        entry = cached.get(path)
+        if entry is not None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is not None and \
+                    [st.st_mtime_ns, st.st_size] == entry[:2]:
+                results[path] = tuple(entry[2:])
+                continue
+        pending.append(path)
+
+    if pending:
+        with ThreadPoolExecutor(workers) as pool:
+            for path, header in zip(pending, pool.map(read_header, pending)):
+                results[path] = header[2:]
+                if header[0] is not None:
+                    cached[path] = list(header)
+                else:
+                    cached.pop(path, None)
+        if cache_path is not None:
+            with open(cache_path + '.tmp', 'w') as f:
+                json.dump(cached, f)
+            os.replace(cache_path + '.tmp', cache_path)
+    return results
+
+
+def check_images(images, pairs=(), cache_path=None, workers=None):
+    """ return the problems found in a set of images, as messages
+
+    images: the image paths that must exist and decode
+    pairs: (stimulus, mask) paths that must have the same size
+    """
+
+    headers = read_headers(list(images) + [p for pair in pairs for p in pair],
+                           cache_path, workers)
+    problems = []
+    for path in sorted(headers):
+        error = headers[path][2]
+        if error is not None:
+            problems.append('%s: %s' % (path, error))
+    for stim_path, mask_path in pairs:
+        stim = headers[stim_path]
+        mask = headers[mask_path]
+        if stim[2] is None and mask[2] is None and stim[:2] != mask[:2]:
+            problems.append('%s: %dx%d, its stimulus %s is %dx%d'
+                            % ((mask_path,) + tuple(mask[:2]) +
+                               (stim_path,) + tuple(stim[:2])))
+    return problems
+
+
+def search_images(media_dir, indices):
+    """ return (images, (stimulus, mask) pairs) of the search trials of the
+    image indices
+    """
+
+    background_dir = os.path.join(media_dir, 'backgrounds')
+    images = [os.path.join(background_dir, 'image1.png'),
+              os.path.join(background_dir, 'image3.png')]
+    pairs = []
+    for idx in indices:
+        target, stim, mask = trial_image_paths(
+            idx, os.path.join(media_dir, 'targets'),
+            os.path.join(media_dir, 'stimuli'), os.path.join(media_dir, 'gt'))
+        images.append(target)
+        pairs.append((stim, mask))
+    return images, pairs
+
+
+def check_session(config, schedule, trials=None, workers=None):
+    """ return the problems found in the images of a session
+
+    config: the SessionConfig of the session
+    schedule: its Schedule, which lists the images of each trial
+    trials: the schedule entries of the trials to run, all of them if None;
+            fewer for a resumed session
+    """
+
+    images = list(schedule.shared_assets)
+    pairs = []
+    for trial in schedule.trials if trials is None else trials:
+        if schedule.task == 'search':
+            target, stim, mask = trial['assets']
+            images.append(target)
+            pairs.append((stim, mask))
+        else:
+            images.extend(trial['assets'])
+    if config.task == 'search':
+        cache_path = os.path.join(config.media_dir, CACHE_NAME)
+    else:
+        cache_path = os.path.join(config.images_dir, CACHE_NAME)
+    if not os.path.isdir(os.path.dirname(cache_path)):
+        cache_path = None
+    return check_images(images, pairs, cache_path, workers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Check the images of the search trials 1..num_trials')
+    parser.add_argument('media_dir', nargs='?', default='media',
+                        help='folder holding the media folders')
+    parser.add_argument('--trials', type=int, default=240,
+                        help='number of images of the session')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of threads reading the headers')
+    args = parser.parse_args()
+
+    images, pairs = search_images(args.media_dir, range(1, args.trials + 1))
+    problems = check_images(images, pairs,
+                            os.path.join(args.media_dir, CACHE_NAME),
+                            args.workers)
+    for problem in problems:
+        print('ERROR: %s' % problem)
+    print('%d image(s) checked, %d problem(s)'
+          % (len(images) + 2 * len(pairs), len(problems)))
@@ -0,0 +1,18 @@
+import os
+
+# Paths of the media of a search trial
+#
+# Kept apart from stimcache (which needs pygame) so the schedule and the
+# media check can list the images of a session without loading pygame.
+
+
+def trial_image_paths(idx, target_dir, stimuli_dir, mask_dir):
+    """ return the (target, stimulus, gt mask) image paths of a trial
+
+    idx: the image index of the trial, e.g., 7 -> t007.jpg, img007.jpg, gt7.jpg
+    target_dir/stimuli_dir/mask_dir: the media folders holding the images
+    """
+
+    return (os.path.join(target_dir, f"t{idx:03}.jpg"),
+            os.path.join(stimuli_dir, f"img{idx:03}.jpg"),
+            os.path.join(mask_dir, f"gt{idx}.jpg"))
@@ -0,0 +1,81 @@
+import queue
+import threading
+
+# Background prefetcher for the trial images
+#
+# A worker thread decodes the images of the upcoming trials (pygame releases
+# the GIL while decoding) and hands them to the trial loop through a bounded
+# queue; the trial loop convert()s them into the StimulusCache.
+
+
+class TrialPrefetcher(object):
+    """ decode the images of upcoming trials on a worker thread
+
+    cache: the StimulusCache the decoded images are handed over to
+    trial_paths: the image paths of each trial, in presentation order
+    depth: the maximum number of decoded trials waiting in the queue
+    """
+
+    def __init__(self, cache, trial_paths, depth=2):
+        self.cache = cache
+        self.trial_paths = trial_paths
+        self.misses = 0
+        self._ready = queue.Queue(maxsize=depth)
+        self._consumed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """ stop the worker thread, images still in the queue are dropped """
+
+        self._stop.set()
+        # unblock the worker if it is waiting on a full queue
+        while True:
+            try:
+                self._ready.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
+
+    def _run(self):
+        for pos, paths in enumerate(self.trial_paths):
+            # skip the trials the main loop already loaded by itself
+            if pos < self._consumed or all(p in self.cache for p in paths):
+                continue
+            images = [(p, self.cache.load(p)) for p in paths]
+            while not self._stop.is_set():
+                try:
+                    self._ready.put((pos, images), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if self._stop.is_set():
+                break
+
+    def collect(self, pos):
+        """ make sure the images of trial pos (0-based) are in the cache
+
+        decoded trials waiting in the queue are converted into the cache;
+        if the prefetch of trial pos has not finished yet, its images are
+        loaded synchronously and the miss is logged
+        """
+
+        self._consumed = pos
+        while True:
+            try:
+                ready_pos, images = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if ready_pos >= pos:
+                for path, surf in images:
+                    self.cache.put(path, surf)
+
+        missing = [p for p in self.trial_paths[pos] if p not in self.cache]
+        if missing:
+            self.misses += 1
+            print(f'Prefetch miss for trial {pos + 1}, loading {len(missing)} image(s)')
+            self.cache.preload(missing)
+        self._consumed = pos + 1
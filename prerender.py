@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import os
+
+import pygame
+
+from backdrop import host_backdrop, rgb_rows
+
+# Pre-rendered pictures for picturewc
+#
+# Every picture is rendered once per session layout: scaled to the screen
+# and image_scale, centered on the gray background, and downsampled for the
+# Host backdrop. The results are stored as raw RGB in a content-addressed
+# cache (picture hash + resolution + scale), so starting the experiment and
+# running a trial only reads precomputed pixels. Run this file before a
+# session to fill the cache; anything missing is rendered on first use.
+
+BG_COLOR = (128, 128, 128)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def artifact_key(path, scn_size, image_scale, host_size):
+    """ return the cache key of a picture rendered for a session layout """
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    key = '%s_%dx%d_%g' % (digest[:20], scn_size[0], scn_size[1], image_scale)
+    if host_size is not None:
+        key += '_host%dx%d' % tuple(host_size)
+    return key
+
+
+def render_picture(path, scn_size, image_scale, bg_color=BG_COLOR):
+    """ render a picture the way picturewc shows it
+
+    the picture is scaled to fit the screen (keeping its aspect ratio), then
+    by image_scale, and centered on a bg_color screen
+
+    returns the rendered screen surface and a dict describing the layout
+    """
+
+    img = pygame.image.load(path)
+    scn_width, scn_height = scn_size
+    img_width, img_height = img.get_size()
+    img_ratio = img_width / img_height
+    # Scale while preserving aspect ratio
+    if img_ratio > scn_width / scn_height:
+        # Image is wider than screen
+        new_width = scn_width
+        new_height = int(scn_width / img_ratio)
+    else:
+        # Image is taller than screen
+        new_height = scn_height
+        new_width = int(scn_height * img_ratio)
+    new_width = int(new_width * image_scale)
+    new_height = int(new_height * image_scale)
+
+    img = pygame.transform.smoothscale(img, (new_width, new_height))
+    screen = pygame.Surface(scn_size)
+    screen.fill(bg_color)
+    screen.blit(img, ((scn_width - new_width) // 2,
+                      (scn_height - new_height) // 2))
+    layout = {'image_size': [img_width, img_height],
+              'scaled_size': [new_width, new_height]}
+    return screen, layout
+
+
+def write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class PrerenderCache(object):
+    """ rendered screens and Host backdrops of the pictures, cached on disk
+
+    cache_dir: folder holding the rendered artifacts
+    scn_size: (width, height) of the experiment screen
+    image_scale: the image scale factor of the session
+    host_size: (width, height) of the Host display, None for full resolution
+    """
+
+    def __init__(self, cache_dir, scn_size, image_scale, host_size=None):
+        self.cache_dir = cache_dir
+        self.scn_size = tuple(scn_size)
+        self.image_scale = image_scale
+        self.host_size = host_size
+        self._loaded = {}
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.screen.rgb', base + '.host.rgb'
+
+    def prepare(self, path):
+        """ render a picture into the cache unless it is already there
+
+        returns the cache key of the picture
+        """
+
+        key = artifact_key(path, self.scn_size, self.image_scale,
+                           self.host_size)
+        meta_path, screen_path, host_path = self._paths(key)
+        if os.path.exists(meta_path):
+            return key
+
+        screen, layout = render_picture(path, self.scn_size, self.image_scale)
+        host = host_backdrop(screen, self.host_size)
+        layout['host_size'] = list(host.get_size())
+
+        write_atomic(screen_path, pygame.image.tostring(screen, 'RGB'))
+        write_atomic(host_path, pygame.image.tostring(host, 'RGB'))
+        # the metadata goes last, it marks the artifacts as complete
+        write_atomic(meta_path, json.dumps(layout).encode())
+        return key
+
+    def load(self, path):
+        """ return the rendered screen, Host backdrop and layout of a picture
+
+        the screen is a display-converted surface, the backdrop is the
+        (width, height, pixels) payload of bitmapBackdrop(); both are kept
+        in memory for the pictures shown more than once in a session
+        """
+
+        if path in self._loaded:
+            return self._loaded[path]
+
+        key = self.prepare(path)
+        meta_path, screen_path, host_path = self._paths(key)
+        with open(meta_path) as f:
+            layout = json.load(f)
+        with open(screen_path, 'rb') as f:
+            screen = pygame.image.frombuffer(f.read(), self.scn_size, 'RGB')
+        host_width, host_height = layout['host_size']
+        with open(host_path, 'rb') as f:
+            pixels = rgb_rows(f.read(), host_width, host_height)
+
+        loaded = (screen.convert(), (host_width, host_height, pixels), layout)
+        self._loaded[path] = loaded
+        return loaded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Pre-render the pictures of picturewc for a screen layout')
+    parser.add_argument('image_dir', nargs='?', default='images',
+                        help='folder holding the pictures')
+    parser.add_argument('--cache-dir', default=None,
+                        help='artifact folder, <image_dir>/.prerendered by default')
+    parser.add_argument('--display', type=int, default=1,
+                        help='display to detect the resolution of')
+    parser.add_argument('--size', default=None,
+                        help='screen resolution, e.g., 1920x1080')
+    parser.add_argument('--scale', type=float, default=0.5,
+                        help='image scale factor')
+    parser.add_argument('--host-size', default='1024x768',
+                        help="Host display resolution, 'none' for full size")
+    args = parser.parse_args()
+
+    if args.size is not None:
+        scn_size = tuple(int(v) for v in args.size.split('x'))
+    else:
+        pygame.display.init()
+        scn_size = pygame.display.get_desktop_sizes()[args.display]
+    host_size = None
+    if args.host_size.lower() != 'none':
+        host_size = tuple(int(v) for v in args.host_size.split('x'))
+    cache_dir = args.cache_dir
+    if cache_dir is None:
+        cache_dir = os.path.join(args.image_dir, '.prerendered')
+
+    cache = PrerenderCache(cache_dir, scn_size, args.scale, host_size)
+    for fname in sorted(os.listdir(args.image_dir)):
+        if fname.lower().endswith(IMAGE_EXTENSIONS):
+            key = cache.prepare(os.path.join(args.image_dir, fname))
+            print('%s -> %s' % (fname, key))
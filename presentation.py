@@ -0,0 +1,180 @@
+import time
+
+import pygame
+from pygame.locals import *
+
+from fliptiming import FlipTimer
+
+# Frame-locked stimulus presentation
+#
+# Each screen is flipped once and kept up for a whole number of refresh
+# intervals; between flips we block on the event queue instead of redrawing,
+# so a 500/1500/500 ms sequence costs next to no CPU.
+
+# the last few ms before a deadline are polled rather than slept through, as
+# the OS may wake us up late from a timed wait
+SPIN_S = 0.002
+
+
+def measure_refresh_rate(n_frames=30):
+    """ estimate the refresh rate (Hz) of the current display by timing flips
+
+    n_frames: the number of flips to time
+
+    returns None if flip() does not wait for the vertical retrace, e.g., a
+    window without vsync
+    """
+
+    intervals = []
+    t_last = None
+    for i in range(n_frames + 1):
+        pygame.display.flip()
+        t_now = time.perf_counter()
+        if t_last is not None:
+            intervals.append(t_now - t_last)
+        t_last = t_now
+    intervals.sort()
+    median = intervals[len(intervals) // 2]
+
+    # flips that return in under 2 ms are not locked to the retrace
+    if median < 0.002:
+        return None
+    return 1.0 / median
+
+
+class Abort(Exception):
+    """ the participant quit (window closed or ESCAPE) while a screen was up """
+
+
+class ScreenTiming(object):
+    """ onset/offset of a presented screen (time.perf_counter() seconds)
+
+    the offset is filled in by the flip that replaces the screen; dropped
+    is True if the screen came up later than it was scheduled for
+    """
+
+    def __init__(self, onset, frames, dropped=False):
+        self.onset = onset
+        self.frames = frames
+        self.dropped = dropped
+        self.offset = None
+
+    def duration_ms(self):
+        if self.offset is None:
+            return None
+        return (self.offset - self.onset) * 1000.0
+
+
+class Presenter(object):
+    """ present screens for an exact number of refresh intervals
+
+    win: the window surface to draw on
+    refresh_hz: refresh rate of the display, measured if not specified
+    timing_log: CSV file to log the timing of every flip to
+
+    raises RuntimeError if the refresh rate is neither given nor measured
+    """
+
+    def __init__(self, win, refresh_hz=None, timing_log=None):
+        self.win = win
+        measured_hz = measure_refresh_rate()
+        # without vsync flips land right away, so we wait for the full
+        # duration instead of waking up ahead of the retrace
+        self.vsync = measured_hz is not None
+        if refresh_hz:
+            self.refresh_source = 'config'
+            if measured_hz is not None and \
+                    abs(measured_hz - refresh_hz) > 0.05 * refresh_hz:
+                print('WARNING: refresh_hz is %.2f Hz, the display runs at '
+                      '%.2f Hz' % (refresh_hz, measured_hz))
+        elif measured_hz is not None:
+            refresh_hz = measured_hz
+            self.refresh_source = 'measured'
+        else:
+            raise RuntimeError('the flips are not locked to the retrace, so '
+                               'the refresh rate cannot be measured; set '
+                               'refresh_hz in the session options')
+        self.refresh_hz = refresh_hz
+        print('Refresh rate: %.2f Hz (%s)'
+              % (self.refresh_hz, self.refresh_source))
+        if not self.vsync:
+            print('WARNING: flips are not locked to the retrace, screen '
+                  'durations are timed by the clock only')
+        self.frame_s = 1.0 / self.refresh_hz
+        self.timer = FlipTimer(self.refresh_hz, timing_log)
+        self.current = None
+
+    def frames_for(self, ms):
+        """ return the number of refresh intervals closest to ms """
+
+        return max(1, int(round(ms / 1000.0 * self.refresh_hz)))
+
+    def start_trial(self, trial):
+        """ tag the following flips with a new trial number in the timing log """
+
+        self.timer.start_trial(trial)
+
+    def flip(self, label='', frames=None):
+        """ flip the window and return the timing of the new screen
+
+        the screen currently shown gets its offset from this flip, which is
+        expected to land once that screen has been up for all its frames
+        """
+
+        expected = None
+        if self.current is not None and self.current.frames is not None:
+            expected = self.current.onset + self.current.frames * self.frame_s
+        record = self.timer.flip(label, expected)
+        if self.current is not None:
+            self.current.offset = record.time
+        self.current = ScreenTiming(record.time, frames, record.dropped)
+        return self.current
+
+    def show(self, image, rect, ms, bg_color=(0, 0, 0), label=''):
+        """ show an image for ms (rounded to whole frames) and return its timing
+
+        image/rect: the image to show and where to put it
+        ms: how long to keep the image on the screen
+        bg_color: color to fill the rest of the screen with
+        label: what is being shown, for the timing log
+        """
+
+        self.win.fill(bg_color)
+        self.win.blit(image, rect.topleft)
+        timing = self.flip(label, self.frames_for(ms))
+        self.wait_until(self.next_flip_time(timing))
+        return timing
+
+    def next_flip_time(self, timing):
+        """ return when to flip the screen after the one of timing, for it
+        to stay up for its frames (time.perf_counter())
+
+        with vsync this is half a frame early, the flip waits for the retrace
+        """
+
+        frames = timing.frames
+        if self.vsync:
+            frames -= 0.5
+        return timing.onset + frames * self.frame_s
+
+    def wait_until(self, deadline):
+        """ wait until deadline (time.perf_counter()), raise Abort on QUIT/ESCAPE
+        """
+
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if remaining > SPIN_S:
+                timeout_ms = max(1, int((remaining - SPIN_S) * 1000))
+                ev = pygame.event.wait(timeout_ms)
+                events = [ev] if ev.type != NOEVENT else []
+            else:
+                events = pygame.event.get()
+            for ev in events:
+                if ev.type == QUIT or \
+                        (ev.type == KEYDOWN and ev.key == K_ESCAPE):
+                    raise Abort()
+
+    def close(self):
+        self.timer.close()
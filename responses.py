@@ -0,0 +1,82 @@
+import time
+
+import pygame
+from pygame.locals import *
+
+from presentation import SPIN_S
+
+# Event-driven response collection
+#
+# Waiting for a response blocks on the event queue until the next event or
+# the deadline, instead of polling pygame.event.get() in a loop; the process
+# sleeps during the search and still wakes up as soon as the participant
+# clicks or presses a key.
+#
+# Responses are stamped with time.perf_counter_ns() as soon as the blocked
+# wait returns; pygame events carry no SDL timestamp to stamp them earlier.
+
+CLICK = 'click'
+KEY = 'key'
+TIMEOUT = 'timeout'
+ABORT = 'abort'
+
+# the longest single wait on the event queue (in ms), SDL takes a 32-bit
+# timeout; a longer wait is a series of these
+MAX_WAIT_MS = 60000
+
+
+class Response(object):
+    """ a response returned by wait_response()
+
+    kind: CLICK, KEY, TIMEOUT or ABORT (the window was closed)
+    time_ns: time.perf_counter_ns() timestamp of the response
+    pos, button: screen position and mouse button of a click
+    key, mod: key code and modifier keys of a key press
+    """
+
+    def __init__(self, kind, time_ns, pos=None, button=None, key=None, mod=0):
+        self.kind = kind
+        self.time_ns = time_ns
+        self.time = time_ns / 1e9
+        self.pos = pos
+        self.button = button
+        self.key = key
+        self.mod = mod
+
+    def rt(self, onset):
+        """ return the response time (in seconds) relative to onset
+
+        onset: the stimulus onset (time.perf_counter() seconds), e.g., the
+               measured time of its flip
+        """
+
+        return self.time - onset
+
+
+def wait_response(deadline, keys=(), clicks=True):
+    """ block until a response or until deadline (time.perf_counter())
+
+    deadline: float('inf') waits for a response for as long as it takes
+    keys: the key codes that count as a response, other keys are ignored
+    clicks: True if a mouse click counts as a response
+    """
+
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return Response(TIMEOUT, time.perf_counter_ns())
+        if remaining > SPIN_S:
+            ev = pygame.event.wait(
+                max(1, int(min(remaining - SPIN_S, MAX_WAIT_MS / 1000.0) *
+                           1000)))
+        else:
+            ev = pygame.event.poll()
+        t = time.perf_counter_ns()
+        if ev.type == NOEVENT:
+            continue
+        if ev.type == QUIT:
+            return Response(ABORT, t)
+        elif ev.type == MOUSEBUTTONDOWN and clicks:
+            return Response(CLICK, t, pos=ev.pos, button=ev.button)
+        elif ev.type == KEYDOWN and ev.key in keys:
+            return Response(KEY, t, key=ev.key, mod=ev.mod)
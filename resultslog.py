@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+# Append-only behavioural results log
+#
+# One JSON line is written per click and per trial. Lines go through a
+# buffered file, so logging a click costs microseconds; the file is flushed
+# and fsync()-ed at the end of every trial, so a crash loses at most the
+# trial that was running.
+
+
+class ResultsLog(object):
+    """ stream click and trial records to a JSONL file
+
+    path: the file to append the records to
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', buffering=64 * 1024)
+        self._write({'type': 'session',
+                     'start': time.strftime('%Y-%m-%d %H:%M:%S')})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def click(self, trial, image, pos, hit, rt):
+        """ log a mouse click
+
+        trial: trial number, image: image index of the trial
+        pos: the (x, y) click position on the screen
+        hit: True if the click fell on the target
+        rt: response time of the click (in seconds)
+        """
+
+        self._write({'type': 'click', 'trial': trial, 'image': image,
+                     'x': pos[0], 'y': pos[1], 'hit': hit, 'rt': rt})
+
+    def trial(self, trial, image, hit, rt, timeout, extra=None):
+        """ log the outcome of a trial and flush the log to disk
+
+        hit: True if the target was found
+        rt: response time of the trial (in seconds)
+        timeout: True if the trial ended without a correct click
+        extra: dict of additional fields, e.g., the onsets of the screens
+        """
+
+        record = {'type': 'trial', 'trial': trial, 'image': image,
+                  'hit': hit, 'rt': rt, 'timeout': timeout}
+        if extra:
+            record.update(extra)
+        self._write(record)
+        self.sync()
+
+    def sync(self):
+        """ push the buffered records to disk """
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
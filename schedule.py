@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import random
+
+from mediapaths import trial_image_paths
+
+# Trial schedule of a session
+#
+# The whole trial sequence is drawn before the session starts, from a
+# participant seed, and written to the session folder as
+# <session>_schedule.json. Each trial lists the images (assets) it shows,
+# which is what the media check and the prefetcher work from; the trial
+# loop only walks through the trials. Running a session again with the
+# same seed and options, or with --schedule <file>, presents the same
+# trials in the same order.
+#
+# Counterbalancing rules (session options):
+#   counterbalance: 'latin' orders the trials by a row of a balanced Latin
+#                   square (Williams design), the row being the seed; over
+#                   consecutive seeds every item is shown at every position
+#                   and after every other item equally often. Otherwise the
+#                   order is random (shuffle) or fixed.
+#   max_condition_run: picture task, the longest run of trials of the same
+#                      condition allowed in a random order
+
+SCHEDULE_VERSION = 1
+
+# the random orders tried to meet max_condition_run before giving up
+MAX_DRAWS = 10000
+
+
+def latin_square_row(items, row):
+    """ return items in the order of a row of a balanced Latin square
+
+    for an odd number of items, the square has 2 * len(items) rows
+    """
+
+    n = len(items)
+    order = []
+    left, right = 0, 0
+    for i in range(n):
+        if i < 2 or i % 2:
+            value = left
+            left += 1
+        else:
+            value = n - right - 1
+            right += 1
+        order.append(items[(value + row) % n])
+    if n % 2 and (row // n) % 2:
+        order.reverse()
+    return order
+
+
+def longest_run(values):
+    """ return the length of the longest run of equal values """
+
+    longest = run = 0
+    previous = object()
+    for value in values:
+        run = run + 1 if value == previous else 1
+        longest = max(longest, run)
+        previous = value
+    return longest
+
+
+def order_items(items, config, seed, rng, block=0, key=None):
+    """ return items in presentation order under the counterbalancing rules
+    of config
+
+    block: the index of the repetition of the items, the Latin square row
+           moves on with each repetition
+    key: returns the condition of an item, for max_condition_run
+    """
+
+    if config.counterbalance == 'latin':
+        return latin_square_row(items, seed + block)
+    if config.counterbalance not in (None, 'none'):
+        raise ValueError('unknown counterbalance rule %r'
+                         % config.counterbalance)
+    items = list(items)
+    if not config.shuffle:
+        return items
+    max_run = config.max_condition_run if key is not None else None
+    for draw in range(MAX_DRAWS):
+        rng.shuffle(items)
+        if not max_run or longest_run(map(key, items)) <= max_run:
+            return items
+    raise ValueError('no trial order with runs of at most %d trials of a '
+                     'condition' % max_run)
+
+
+class Schedule(object):
+    """ the trials of a session, in presentation order
+
+    task: 'search' or 'picture'
+    seed: the participant seed the order was drawn from
+    trials: one dict per trial: its position ('trial', from 1), what it
+            shows ('index' of the search image, or 'condition' and
+            'picture') and its 'assets', the image paths it needs
+    shared_assets: the images every trial shows, e.g., fixation screens
+    rules: the counterbalancing options the order was drawn with
+
+    the order is drawn again from seed and rules, so the schedule keeps no
+    random generator state
+    """
+
+    def __init__(self, task, seed, trials, shared_assets=(), rules=None):
+        self.task = task
+        self.seed = seed
+        self.trials = trials
+        self.shared_assets = list(shared_assets)
+        self.rules = rules or {}
+
+    def __len__(self):
+        return len(self.trials)
+
+    def __iter__(self):
+        return iter(self.trials)
+
+    def save(self, path):
+        """ write the schedule to a JSON file """
+
+        data = {'version': SCHEDULE_VERSION, 'task': self.task,
+                'seed': self.seed, 'rules': self.rules,
+                'shared_assets': self.shared_assets, 'trials': self.trials}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """ read a schedule written by save() """
+
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != SCHEDULE_VERSION:
+            raise ValueError('%s is not a version %d trial schedule'
+                             % (path, SCHEDULE_VERSION))
+        return cls(data['task'], data['seed'], data['trials'],
+                   data['shared_assets'], data['rules'])
+
+
+def make_schedule(config, seed=None):
+    """ draw the trial schedule of a SessionConfig
+
+    seed: the participant seed, config.seed if not given; a random one is
+          drawn (and recorded in the schedule) if neither is set
+    """
+
+    if seed is None:
+        seed = config.seed
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 31)
+    rng = random.Random(seed)
+    rules = {'shuffle': config.shuffle,
+             'counterbalance': config.counterbalance,
+             'max_condition_run': config.max_condition_run}
+
+    trials = []
+    if config.task == 'search':
+        media_dir = config.media_dir
+        indices = order_items(list(range(1, config.num_trials + 1)), config,
+                              seed, rng)
+        for trial_num, idx in enumerate(indices, 1):
+            assets = trial_image_paths(
+                idx, os.path.join(media_dir, 'targets'),
+                os.path.join(media_dir, 'stimuli'),
+                os.path.join(media_dir, 'gt'))
+            trials.append({'trial': trial_num, 'index': idx,
+                           'assets': list(assets)})
+        background_dir = os.path.join(media_dir, 'backgrounds')
+        shared = [os.path.join(background_dir, 'image1.png'),
+                  os.path.join(background_dir, 'image3.png')]
+    else:
+        pictures = [tuple(pars) for pars in config.pictures]
+        if config.counterbalance == 'latin':
+            order = []
+            for block in range(config.picture_repeats):
+                order += order_items(pictures, config, seed, rng, block)
+        else:
+            order = order_items(pictures * config.picture_repeats, config,
+                                seed, rng, key=lambda pars: pars[0])
+        for trial_num, (cond, pic) in enumerate(order, 1):
+            trials.append({'trial': trial_num, 'condition': cond,
+                           'picture': pic,
+                           'assets': [os.path.join(config.images_dir, pic)]})
+        shared = []
+
+    return Schedule(config.task, seed, trials, shared, rules)
+
+
+if __name__ == '__main__':
+    import engine
+
+    parser = argparse.ArgumentParser(
+        description='Draw the trial schedule of a session ahead of time')
+    parser.add_argument('--config', action='append', default=[],
+                        metavar='TOML', help='file of session options')
+    parser.add_argument('--task', choices=engine.TASKS, default=None,
+                        help='the task of the session')
+    parser.add_argument('--trials', type=int, default=None,
+                        help='number of trials of the search task')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='participant seed')
+    parser.add_argument('--out', default='schedule.json',
+                        help='schedule file to write')
+    args = parser.parse_args()
+
+    config = engine.SessionConfig()
+    for path in args.config:
+        config.load(path)
+    if args.task is not None:
+        config.update(task=args.task)
+    if args.trials is not None:
+        config.update(num_trials=args.trials)
+    schedule = make_schedule(config, args.seed)
+    schedule.save(args.out)
+    print('%d %s trials, seed %d, written to %s'
+          % (len(schedule), schedule.task, schedule.seed, args.out))
@@ -0,0 +1,68 @@
+import queue
+import threading
+
+import pygame
+
+# Background writer for the rendered trial snapshots
+#
+# Compressing a full-screen PNG/JPEG blocks for tens to hundreds of ms. The
+# presentation thread only copies the pixels out of the surface; worker
+# threads encode and write them (PIL releases the GIL while encoding).
+
+
+class SnapshotWriter(object):
+    """ save surface snapshots to disk on worker threads
+
+    max_pending: the maximum number of snapshots waiting to be written,
+                 submit() blocks once the queue is full
+    workers: the number of writer threads
+    """
+
+    def __init__(self, max_pending=8, workers=1):
+        self.written = 0
+        self.errors = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._threads = [threading.Thread(target=self._run, daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def backlog(self):
+        """ return the number of snapshots not written yet """
+
+        return self._pending.unfinished_tasks
+
+    def submit(self, surf, path):
+        """ copy the pixels of surf and queue them to be saved at path """
+
+        data = pygame.image.tostring(surf, 'RGB')
+        self._pending.put((path, surf.get_size(), data))
+
+    def _run(self):
+        from PIL import Image
+
+        while True:
+            item = self._pending.get()
+            if item is None:
+                self._pending.task_done()
+                break
+            path, size, data = item
+            # whatever goes wrong with a snapshot, the writer carries on
+            # with the next one and the queue keeps draining
+            try:
+                Image.frombytes('RGB', size, data).save(path)
+                self.written += 1
+            except Exception as err:
+                print('ERROR: cannot save snapshot %s: %s' % (path, err))
+                self.errors += 1
+            finally:
+                self._pending.task_done()
+
+    def close(self):
+        """ write the remaining snapshots and stop the writer threads """
+
+        for thread in self._threads:
+            self._pending.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
@@ -0,0 +1,136 @@
+import os
+from collections import OrderedDict
+
+import pygame
+
+from gtmask import TargetMask
+
+# Stimulus cache shared by the natural image search scripts
+#
+# Every target, stimulus and gt mask is decoded and convert()-ed once, then
+# served from memory, so the trial loop never touches the disk or the JPEG
+# decoder between the fixation screen and the search display. Images from
+# the mask folder are kept as thresholded TargetMask bitmaps instead.
+#
+# Images of a media bundle stored in the window's pixel format are not
+# cached at all: their surfaces over the memory-mapped bundle are blitted
+# as they are, so they take no memory besides the page cache.
+
+
+def entry_nbytes(entry):
+    """ return the number of bytes held by a cached surface or mask """
+
+    if isinstance(entry, TargetMask):
+        return entry.nbytes()
+    return entry.get_pitch() * entry.get_height()
+
+
+class StimulusCache(object):
+    """ LRU cache of decoded, display-converted images
+
+    max_mb: memory cap for the cached pixels (in MB), the least recently
+            used images are evicted once the cap is exceeded
+    mask_dir: images in this folder are gt masks, cached as TargetMask
+    mask_tolerance: hit tolerance (in pixels) of the cached masks
+    bundle: MediaBundle the images are taken from instead of being decoded,
+            if they are in it
+
+    the display mode must be set before creating the cache
+    """
+
+    def __init__(self, max_mb=512, mask_dir=None, mask_tolerance=0,
+                 bundle=None):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.mask_dir = mask_dir
+        self.mask_tolerance = mask_tolerance
+        self.bundle = bundle
+        # the bundle images need no convert() and are served from the bundle
+        self.zero_copy = bundle is not None and \
+            bundle.native(pygame.display.get_surface())
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, path):
+        return path in self._entries or self.in_bundle(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_mask(self, path):
+        if self.mask_dir is None:
+            return False
+        folder = os.path.normpath(os.path.dirname(path))
+        return folder == os.path.normpath(self.mask_dir)
+
+    def in_bundle(self, path):
+        """ return True if the image at path is blitted from the bundle """
+
+        return self.zero_copy and path in self.bundle and \
+            not self.is_mask(path)
+
+    def load(self, path):
+        """ return the decoded image at path, a surface over the media
+        bundle if it holds the image
+        """
+
+        if self.bundle is not None and path in self.bundle:
+            return self.bundle.surface(path)
+        return pygame.image.load(path)
+
+    def put(self, path, surf):
+        """ convert a decoded image to the display format and cache it
+
+        the display mode must be set before calling this, as convert()
+        matches the pixel format of the current window; gt masks are
+        thresholded into a TargetMask instead
+        """
+
+        if self.is_mask(path):
+            entry = TargetMask.from_surface(surf, self.mask_tolerance)
+        else:
+            entry = surf.convert()
+        if path in self._entries:
+            self.nbytes -= entry_nbytes(self._entries.pop(path))
+        self._entries[path] = entry
+        self.nbytes += entry_nbytes(entry)
+        self._evict()
+        return entry
+
+    def get(self, path):
+        """ return the converted image (or TargetMask) stored at path
+
+        the image is loaded on a cache miss
+        """
+
+        if self.in_bundle(path):
+            self.hits += 1
+            return self.bundle.surface(path)
+
+        entry = self._entries.get(path)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return entry
+
+        self.misses += 1
+        return self.put(path, self.load(path))
+
+    def preload(self, paths):
+        """ decode and convert a list of images ahead of time
+
+        images already in the cache are only marked as recently used
+        """
+
+        for path in paths:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            elif not self.in_bundle(path):
+                self.put(path, self.load(path))
+
+    def _evict(self):
+        # keep the most recent image even if it alone exceeds the cap
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry_nbytes(entry)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from ascparse import AscData, parse_asc, sample_trials
+
+ASC = """\
+** CONVERTED FROM TEST.EDF
+MSG\t990 DISPLAY_COORDS 0 0 1279 1023
+1000\t  100.0\t  200.0\t 1000.0\t...
+MSG\t1001 TRIALID 1
+1002\t  101.5\t  201.5\t 1001.0\t...
+MSG\t1003 -5 image_onset
+1004\t    .\t    .\t    0.0\t...
+EFIX L   1002\t1004\t3\t  101.0\t  201.0\t   1000
+ESACC L  1004\t1006\t3\t  101.0\t  201.0\t  300.0\t  400.0\t   2.50\t    150
+MSG\t1006 !V TRIAL_VAR hit 1
+MSG\t1007 !V TRIAL_VAR note
+MSG\t1008 TRIAL_RESULT 0
+1009\t  300.0\t  400.0\t 1002.0\t...
+MSG\t1010 TRIALID 2
+1011\t  310.0\t  410.0\t 1003.0\t...
+ESACC R  1011\t1012\t2\t  310.0\t  410.0\t    .\t    .\t   0.10\t     10
+1012\t  320.0\t  420.0\t 1004.0\t...
+"""
+
+
+@pytest.fixture
+def asc_file(tmp_path):
+    path = tmp_path / 'test.asc'
+    path.write_text(ASC)
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_bytes', [7, 64, 1 << 20])
+def test_tables(asc_file, chunk_bytes):
+    data = parse_asc(asc_file, chunk_bytes)
+
+    trials = data.trials
+    assert trials['trial'].tolist() == [1, 2]
+    assert trials['start'].tolist() == [1001, 1010]
+    # the offset in front of image_onset moves it back to 998
+    assert trials['onset'].tolist() == [998, -1]
+    assert trials['end'].tolist() == [1008, -1]
+    assert trials['result'].tolist() == [0, -1]
+
+    assert data.trial_vars['name'].tolist() == ['hit', 'note']
+    assert data.trial_vars['value'].tolist() == ['1', '']
+
+    messages = data.messages
+    assert messages['trial'].tolist() == [-1, 1, 1, 1, 1, 1, 2]
+    assert messages['text'][2] == 'image_onset'
+    assert messages['time'][2] == 998
+
+    fix = data.fixations
+    assert fix['trial'].tolist() == [1]
+    assert fix['eye'].tolist() == ['L']
+    assert fix['duration'].tolist() == [3]
+    assert fix['x'].tolist() == [101.0]
+
+    sacc = data.saccades
+    assert sacc['trial'].tolist() == [1, 2]
+    assert sacc['eye'].tolist() == ['L', 'R']
+    assert sacc['x1'][0] == 300.0
+    assert np.isnan(sacc['x1'][1])
+
+    samples = data.samples
+    assert samples['time'].tolist() == [1000, 1002, 1004, 1009, 1011, 1012]
+    assert samples['trial'].tolist() == [-1, 1, 1, -1, 2, 2]
+    assert samples['x'][1] == pytest.approx(101.5)
+    assert np.isnan(samples['x'][2]) and np.isnan(samples['y'][2])
+    assert samples['pupil'][2] == 0.0
+
+
+def test_no_trailing_newline(tmp_path):
+    path = tmp_path / 'cut.asc'
+    path.write_text(ASC.rstrip('\n'))
+    assert parse_asc(str(path)).samples['time'][-1] == 1012
+
+
+def test_sample_trials():
+    trials = {'trial': np.array([1, 2]), 'start': np.array([10, 30]),
+              'end': np.array([20, -1])}
+    time = np.array([5, 10, 20, 21, 30, 99])
+    assert sample_trials(time, trials).tolist() == [-1, 1, 1, -1, 2, 2]
+    empty = {'trial': np.array([]), 'start': np.array([]),
+             'end': np.array([])}
+    assert sample_trials(time, empty).tolist() == [-1] * 6
+
+
+def test_save_load(asc_file, tmp_path):
+    data = parse_asc(asc_file)
+    path = str(tmp_path / 'tables.npz')
+    data.save(path)
+    loaded = AscData.load(path)
+    for name in AscData.TABLES:
+        table = getattr(data, name)
+        assert sorted(getattr(loaded, name)) == sorted(table)
+        for column, values in table.items():
+            np.testing.assert_array_equal(getattr(loaded, name)[column],
+                                          values)
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+
+from batchanalysis import (_analyze, in_polygon, interest_areas, on_target,
+                           session_files)
+
+
+def touch(folder, *names):
+    for name in names:
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write(name)
+
+
+def test_session_files_leave_out_converted_asc(tmp_path):
+    folder = str(tmp_path)
+    touch(folder, 's1.EDF', 's1.asc', 'old.asc', 's1_results.jsonl',
+          's1_timing.csv')
+    names = [os.path.basename(p) for p in session_files(folder)]
+    assert names == ['old.asc', 's1.EDF', 's1_results.jsonl']
+
+
+def test_cache_survives_the_asc_conversion(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    touch(folder, 's1.EDF')
+    calls = []
+
+    def analyze_session(path):
+        # the analysis converts the EDF next to it, as edf2asc does
+        calls.append(path)
+        touch(path, 's1.asc')
+        return [{'trial': 1}]
+
+    monkeypatch.setattr('batchanalysis.analyze_session', analyze_session)
+    first = _analyze(folder, None)
+    second = _analyze(folder, first)
+    assert len(calls) == 1
+    assert second == first
+
+
+def test_in_polygon():
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=float)
+    x = np.array([5, 15, -1, 9.9, 5])
+    y = np.array([5, 5, 5, 9.9, 11])
+    assert in_polygon(x, y, square).tolist() == \
+        [True, False, False, True, False]
+
+    # the notch of a U is outside
+    u = np.array([[0, 0], [3, 0], [3, 7], [7, 7], [7, 0], [10, 0],
+                  [10, 10], [0, 10]], dtype=float)
+    assert in_polygon(np.array([5, 5, 1]), np.array([3, 8, 3]),
+                      u).tolist() == [False, True, True]
+
+
+def test_on_target():
+    rect = (0, 0, 10, 10)
+    triangle = np.array([[0, 0], [10, 0], [0, 10]], dtype=float)
+    x = np.array([2, 8, 12])
+    y = np.array([2, 8, 2])
+    assert on_target(x, y, rect, []).tolist() == [True, True, False]
+    assert on_target(x, y, rect, [triangle]).tolist() == [True, False, False]
+    assert not on_target(x, y, None, [triangle]).any()
+
+
+def test_interest_areas():
+    messages = {
+        'trial': np.array([1, 1, 1, 2]),
+        'text': np.array(['!V IAREA RECTANGLE 1 10 20 30 40 target',
+                          '!V IAREA FREEHAND 2 10,20 30,20 30,40 target_1',
+                          'image_onset',
+                          '!V IAREA RECTANGLE 1 0 0 5 5 target'])}
+    rect, polygons = interest_areas(messages, 1)
+    assert rect == (10, 20, 30, 40)
+    assert len(polygons) == 1
+    assert polygons[0].tolist() == [[10, 20], [30, 20], [30, 40]]
+    assert interest_areas(messages, 3) == (None, [])
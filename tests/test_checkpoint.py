@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+
+from checkpoint import CHECKPOINT_SUFFIX, Checkpoint, segment_edf_name
+from schedule import Schedule
+
+
+def test_segment_edf_name():
+    assert segment_edf_name('SUBJ0001', 1) == 'SUBJ0001'
+    assert segment_edf_name('SUBJ0001', 2) == 'SUBJ00_2'
+    assert segment_edf_name('AB', 3) == 'AB_3'
+    assert segment_edf_name('SUBJ0001', 12) == 'SUBJ0_12'
+    assert len(segment_edf_name('SUBJ0001', 99)) == 8
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / ('s1' + CHECKPOINT_SUFFIX))
+    checkpoint = Checkpoint(path, 's1', seed=42)
+    checkpoint.start_segment('SUBJ0001.EDF', 's1.EDF')
+    checkpoint.trial_done({'trial': 1, 'index': 5}, {'result': 0, 'hit': 1})
+
+    loaded = Checkpoint.load(path)
+    assert loaded.session_identifier == 's1'
+    assert loaded.seed == 42
+    assert loaded.next_trial == 1
+    assert loaded.results == [{'trial': 1, 'result': 0, 'hit': 1}]
+    assert loaded.segments == [{'edf_file': 'SUBJ0001.EDF',
+                                'local_name': 's1.EDF', 'first_trial': 1}]
+
+
+def test_save_replaces_atomically(tmp_path):
+    path = str(tmp_path / 'c.json')
+    checkpoint = Checkpoint(path, 's1')
+    checkpoint.save()
+    checkpoint.trial_done({'trial': 1}, {'result': 0})
+    assert os.listdir(str(tmp_path)) == ['c.json']
+    with open(path) as f:
+        assert json.load(f)['next_trial'] == 1
+
+
+def test_crash_mid_write_keeps_the_old_checkpoint(tmp_path, monkeypatch):
+    path = str(tmp_path / 'c.json')
+    checkpoint = Checkpoint(path, 's1')
+    checkpoint.trial_done({'trial': 1}, {'result': 0})
+
+    def crash(fd):
+        raise OSError('disk gone')
+
+    monkeypatch.setattr(os, 'fsync', crash)
+    with pytest.raises(OSError):
+        checkpoint.trial_done({'trial': 2}, {'result': 0})
+    assert Checkpoint.load(path).next_trial == 1
+
+
+def test_resume_index(tmp_path):
+    path = str(tmp_path / 'c.json')
+    checkpoint = Checkpoint(path, 's1')
+    checkpoint.start_segment('SUBJ0001.EDF', 's1.EDF')
+    for trial in range(1, 4):
+        checkpoint.trial_done({'trial': trial}, {'result': 0})
+
+    # a resumed session starts at the position of the next trial and
+    # records it into a new segment
+    resumed = Checkpoint.load(path)
+    assert resumed.next_trial == 3
+    resumed.start_segment('SUBJ00_2.EDF', 's1_seg2.EDF')
+    resumed.trial_done({'trial': 4}, {'result': 0})
+    loaded = Checkpoint.load(path)
+    assert [s['first_trial'] for s in loaded.segments] == [1, 4]
+    assert [r['trial'] for r in loaded.results] == [1, 2, 3, 4]
+    assert loaded.next_trial == 4
+
+
+def test_load_rejects_other_versions(tmp_path):
+    path = str(tmp_path / 'c.json')
+    with open(path, 'w') as f:
+        json.dump({'version': 0}, f)
+    with pytest.raises(ValueError):
+        Checkpoint.load(path)
+
+
+def test_failed_trials_run_again(tmp_path):
+    schedule = Schedule('search', 1, [{'trial': pos, 'index': pos}
+                                      for pos in range(1, 6)])
+    path = str(tmp_path / 'c.json')
+    checkpoint = Checkpoint(path, 's1')
+    checkpoint.start_segment('SUBJ0001.EDF', 's1.EDF')
+    checkpoint.trial_done(schedule.trials[0], {'result': 0})
+    checkpoint.trial_done(schedule.trials[1], None)
+    checkpoint.trial_done(schedule.trials[2], {'result': 0})
+
+    # the failed trial is not recorded as run, and comes first on resume
+    resumed = Checkpoint.load(path)
+    assert [r['trial'] for r in resumed.results] == [1, 3]
+    assert [t['trial'] for t in resumed.trials_left(schedule)] == [2, 4, 5]
+    resumed.start_segment('SUBJ00_2.EDF', 's1_seg2.EDF')
+    assert resumed.segments[-1]['first_trial'] == 2
+
+    resumed.trial_done(schedule.trials[1], {'result': 0})
+    assert resumed.failed == []
+    assert resumed.next_trial == 3
+    assert [t['trial'] for t in resumed.trials_left(schedule)] == [4, 5]
@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+
+from gazereader import (ENDFIX, FIXATION_DTYPE, SAMPLE_DTYPE, SAMPLE_TYPE,
+                        STARTFIX, GazeReader, RingBuffer)
+
+
+def test_ring_buffer_since():
+    ring = RingBuffer(4, SAMPLE_DTYPE)
+    assert ring.last() is None
+    assert len(ring.since(0)) == 0
+    for t in range(3):
+        ring.append(t, 0, 0, 0)
+    assert ring.since(0)['time'].tolist() == [0, 1, 2]
+    assert ring.since(2)['time'].tolist() == [2]
+    assert len(ring.since(3)) == 0
+
+
+def test_ring_buffer_wraparound():
+    ring = RingBuffer(4, SAMPLE_DTYPE)
+    for t in range(10):
+        ring.append(t, t, 0, 0)
+    assert ring.last()['time'] == 9
+    # across the end of the array
+    assert ring.since(7)['time'].tolist() == [7, 8, 9]
+    assert ring.since(6)['time'].tolist() == [6, 7, 8, 9]
+    # records overwritten in the meantime are lost
+    assert ring.since(2)['time'].tolist() == [6, 7, 8, 9]
+    # a copy, not a view that later appends overwrite
+    records = ring.since(8)
+    ring.append(10, 0, 0, 0)
+    ring.append(11, 0, 0, 0)
+    assert records['time'].tolist() == [8, 9]
+
+
+class Eye(object):
+
+    def __init__(self, x, y, pupil):
+        self.gaze = (x, y)
+        self.pupil = pupil
+
+    def getGaze(self):
+        return self.gaze
+
+    def getPupilSize(self):
+        return self.pupil
+
+
+class Sample(object):
+
+    def __init__(self, t, x, y):
+        self.t = t
+        self.eye = Eye(x, y, 1000.0)
+
+    def getTime(self):
+        return self.t
+
+    def isRightSample(self):
+        return True
+
+    def getRightEye(self):
+        return self.eye
+
+
+class Fixation(object):
+
+    def __init__(self, start, end, x, y):
+        self.start, self.end, self.gaze = start, end, (x, y)
+
+    def getStartTime(self):
+        return self.start
+
+    def getEndTime(self):
+        return self.end
+
+    def getStartGaze(self):
+        return self.gaze
+
+    def getAverageGaze(self):
+        return self.gaze
+
+
+class Link(object):
+    """ a tracker whose link queue holds a list of (type, item) """
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.item = None
+
+    def getNextData(self):
+        if not self.items:
+            return 0
+        data_type, self.item = self.items.pop(0)
+        return data_type
+
+    def getFloatData(self):
+        return self.item
+
+
+def drain(reader, tracker):
+    reader.start()
+    deadline = time.perf_counter() + 2
+    while tracker.items and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    reader.stop()
+
+
+def test_reader():
+    tracker = Link([(SAMPLE_TYPE, Sample(1, 10, 20)),
+                    (STARTFIX, Fixation(2, 0, 11, 21)),
+                    (SAMPLE_TYPE, Sample(3, 12, 22))])
+    reader = GazeReader(tracker, seconds=1, rate=100)
+    reader.start_trial()
+    drain(reader, tracker)
+    assert reader.trial_samples()['time'].tolist() == [1, 3]
+    assert reader.newest_sample()['x'] == 12
+    assert reader.current_fixation() == (2, 11, 21)
+
+    # a new trial only sees what comes after it started
+    tracker.items = [(ENDFIX, Fixation(2, 5, 11.5, 21.5)),
+                     (SAMPLE_TYPE, Sample(6, 0, 0))]
+    reader.start_trial()
+    drain(reader, tracker)
+    assert reader.current_fixation() is None
+    assert reader.trial_samples()['time'].tolist() == [6]
+    fixations = reader.trial_fixations()
+    assert fixations.dtype == FIXATION_DTYPE
+    assert fixations[['start', 'end']].tolist() == [(2, 5)]
+    assert np.allclose(fixations['x'], [11.5])
@@ -0,0 +1,63 @@
+import math
+
+import pygame
+
+from gtmask import MASK_THRESHOLD, TargetMask, disc_mask
+
+
+def mask_surface(size=(60, 40), box=(20, 10, 10, 10), level=255):
+    surf = pygame.Surface(size)
+    surf.fill((level, level, level), box)
+    return surf
+
+
+def test_disc_mask():
+    disc = disc_mask(3)
+    assert disc.get_size() == (7, 7)
+    assert disc.get_at((3, 3)) and disc.get_at((0, 3)) and disc.get_at((3, 6))
+    assert not disc.get_at((0, 0))
+    assert disc.count() == sum(1 for x in range(7) for y in range(7)
+                               if (x - 3) ** 2 + (y - 3) ** 2 <= 9)
+
+
+def test_threshold():
+    bright = TargetMask.from_surface(mask_surface(level=MASK_THRESHOLD))
+    dark = TargetMask.from_surface(mask_surface(level=MASK_THRESHOLD - 1))
+    assert bright.hit((25, 15), (0, 0))
+    assert not dark.hit((25, 15), (0, 0))
+
+    # a pixel belongs to the target only if every channel is bright
+    surf = pygame.Surface((4, 4))
+    surf.fill((255, 255, 100))
+    assert not TargetMask.from_surface(surf).hit((1, 1), (0, 0))
+
+
+def test_hit_in_screen_coordinates():
+    mask = TargetMask.from_surface(mask_surface())
+    topleft = (100, 200)
+    assert mask.hit((120, 210), topleft)
+    assert mask.hit((129, 219), topleft)
+    assert not mask.hit((130, 219), topleft)
+    assert not mask.hit((119, 210), topleft)
+    # outside of the stimulus
+    assert not mask.hit((50, 50), topleft)
+    assert not mask.hit((1000, 1000), topleft)
+
+
+def test_tolerance_is_a_disc():
+    # a single target pixel at (30, 20)
+    surf = pygame.Surface((60, 40))
+    surf.set_at((30, 20), (255, 255, 255))
+    tolerance = 5
+    mask = TargetMask.from_surface(surf, tolerance)
+    for y in range(40):
+        for x in range(60):
+            inside = math.hypot(x - 30, y - 20) <= tolerance
+            assert mask.hit((x, y), (0, 0)) == inside, (x, y)
+
+
+def test_tolerance_reaches_past_the_stimulus_edge():
+    mask = TargetMask.from_surface(
+        mask_surface(box=(0, 0, 5, 5)), tolerance=3)
+    assert mask.hit((-3, 2), (0, 0))
+    assert not mask.hit((-4, 2), (0, 0))
@@ -0,0 +1,73 @@
+import math
+
+import pygame
+import pytest
+
+from interestareas import (MAX_MESSAGE_CHARS, InterestArea, simplify_line,
+                           simplify_polygon)
+
+
+def target_mask(size, draw):
+    surf = pygame.Surface(size)
+    draw(surf)
+    return pygame.mask.from_threshold(surf, (255, 255, 255), (1, 1, 1, 255))
+
+
+def blobs(surf):
+    pygame.draw.circle(surf, (255, 255, 255), (600, 500), 300)
+    pygame.draw.polygon(surf, (255, 255, 255),
+                        [(100, 100), (300, 150), (150, 600), (280, 900),
+                         (50, 1000)])
+    for i in range(8):
+        pygame.draw.circle(surf, (255, 255, 255),
+                           (1000 + 25 * (i % 2), 120 + 110 * i), 30 + 5 * i)
+
+
+def test_simplify_line():
+    line = [(x, 0) for x in range(10)] + [(10, 5)]
+    assert simplify_line(line, 0.5) == [(0, 0), (9, 0), (10, 5)]
+    assert simplify_line(line, 100) == [(0, 0), (10, 5)]
+
+
+def test_simplify_polygon_keeps_corners():
+    square = ([(x, 0) for x in range(10)] + [(10, y) for y in range(10)] +
+              [(x, 10) for x in range(10, 0, -1)] +
+              [(0, y) for y in range(10, 0, -1)])
+    assert sorted(simplify_polygon(square, 0.5)) == \
+        [(0, 0), (0, 10), (10, 0), (10, 10)]
+
+
+def test_bbox_and_contains():
+    mask = target_mask((80, 60), lambda surf: surf.fill(
+        (255, 255, 255), (10, 20, 30, 15)))
+    area = InterestArea.from_mask(mask)
+    assert area.bbox == (10, 20, 40, 35)
+    assert area.contains((110, 220), (100, 200))
+    assert not area.contains((140, 220), (100, 200))
+    assert area.scaled(2).bbox == (20, 40, 80, 70)
+
+
+@pytest.mark.parametrize('topleft', [(0, 0), (320, 0), (1000, 1000)])
+def test_messages_fit_the_tracker(topleft):
+    area = InterestArea.from_mask(target_mask((1280, 1080), blobs))
+    assert max(len(poly) for poly in area.polygons) > 100
+    messages = area.iarea_messages(topleft)
+    assert messages[0].startswith('!V IAREA RECTANGLE 1 ')
+    freehand = messages[1:]
+    assert len(freehand) == len(area.polygons)
+    for i, msg in enumerate(freehand):
+        assert len(msg) <= MAX_MESSAGE_CHARS
+        fields = msg.split()
+        assert fields[3] == str(i + 2)
+        assert fields[-1] == 'target_%d' % (i + 1)
+        assert len(fields) - 5 >= 3
+
+
+def test_simplified_circle_stays_close():
+    area = InterestArea.from_mask(target_mask(
+        (1280, 1080), lambda surf: pygame.draw.circle(
+            surf, (255, 255, 255), (600, 500), 300)))
+    msg = area.iarea_messages((0, 0))[1]
+    for point in msg.split()[4:-1]:
+        x, y = (int(v) for v in point.split(','))
+        assert abs(math.hypot(x - 600, y - 500) - 300) < 3
@@ -0,0 +1,43 @@
+import linkmessages
+from linkmessages import MessageQueue
+
+
+class Tracker(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def sendMessage(self, msg):
+        self.sent.append(msg)
+
+
+def clock(monkeypatch, *times_ms):
+    """ make perf_counter_ns() return these times (in ms) in turn """
+
+    times = [t * 1000000 for t in times_ms]
+    monkeypatch.setattr(linkmessages.time, 'perf_counter_ns',
+                        lambda: times.pop(0))
+
+
+def test_offsets(monkeypatch):
+    tracker = Tracker()
+    queue = MessageQueue(tracker)
+    queue.message('image_onset', t_ns=1000 * 1000000)
+    queue.message('response', t_ns=1012 * 1000000 + 999999)
+    assert len(queue) == 2
+    # the offset is taken when each message is sent, in whole ms
+    clock(monkeypatch, 1020, 1021)
+    queue.flush()
+    assert tracker.sent == ['20 image_onset', '8 response']
+    assert len(queue) == 0
+
+
+def test_no_offset(monkeypatch):
+    tracker = Tracker()
+    queue = MessageQueue(tracker)
+    clock(monkeypatch, 500, 500.5)
+    queue.message('TRIALID 1')
+    queue.flush()
+    assert tracker.sent == ['TRIALID 1']
+    queue.flush()
+    assert tracker.sent == ['TRIALID 1']
@@ -0,0 +1,87 @@
+import os
+import struct
+
+import pygame
+import pytest
+from PIL import Image
+
+from gtmask import TargetMask
+from maskstore import MaskStore, build_mask_store, mask_file
+
+SIZE = (80, 60)
+# the target of gt<idx>.jpg, (left, top, width, height)
+TARGETS = {1: (10, 10, 20, 15), 2: (40, 30, 25, 20), 12: (0, 0, 8, 8)}
+
+
+def write_mask(mask_dir, idx, box):
+    img = Image.new('RGB', SIZE)
+    left, top, width, height = box
+    img.paste((255, 255, 255), (left, top, left + width, top + height))
+    img.save(mask_file(mask_dir, idx), quality=95)
+
+
+@pytest.fixture
+def store(tmp_path):
+    mask_dir = str(tmp_path / 'gt')
+    os.makedirs(mask_dir)
+    for idx, box in TARGETS.items():
+        write_mask(mask_dir, idx, box)
+    # not a mask, left out of the store
+    Image.new('RGB', SIZE).save(os.path.join(mask_dir, 'other.jpg'))
+    store_path = str(tmp_path / 'gt_masks.bin')
+    assert build_mask_store(mask_dir, store_path) == len(TARGETS)
+    store = MaskStore(store_path, mask_dir)
+    yield store
+    store.close()
+
+
+def decoded_mask(store, idx, tolerance=0):
+    surf = pygame.image.load(mask_file(store.mask_dir, idx))
+    return TargetMask.from_surface(surf, tolerance)
+
+
+def test_index(store):
+    assert len(store) == len(TARGETS)
+    assert all(idx in store for idx in TARGETS)
+    assert 3 not in store
+    assert store.lookup(2).size == SIZE
+
+
+@pytest.mark.parametrize('tolerance', [0, 3])
+def test_hits_match_the_decoded_mask(store, tolerance):
+    topleft = (100, 50)
+    for idx in TARGETS:
+        packed = store.lookup(idx, tolerance)
+        decoded = decoded_mask(store, idx, tolerance)
+        for y in range(-5, SIZE[1] + 5):
+            for x in range(-5, SIZE[0] + 5):
+                pos = (topleft[0] + x, topleft[1] + y)
+                assert packed.hit(pos, topleft) == decoded.hit(pos, topleft)
+
+
+def test_tolerance(store):
+    left, top, width, height = TARGETS[1]
+    y = top + height // 2
+    outside = (left - 3, y)
+    assert not store.lookup(1).hit(outside, (0, 0))
+    assert store.lookup(1, 3).hit(outside, (0, 0))
+    assert not store.lookup(1, 2).hit(outside, (0, 0))
+
+
+def test_check_drops_changed_and_missing_masks(store):
+    assert store.check() == []
+    write_mask(store.mask_dir, 2, (0, 0, 40, 40))
+    st = os.stat(mask_file(store.mask_dir, 2))
+    os.utime(mask_file(store.mask_dir, 2),
+             ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    os.remove(mask_file(store.mask_dir, 12))
+    assert sorted(store.check()) == [2, 12]
+    assert 1 in store and 2 not in store and 12 not in store
+
+
+def test_old_store_is_rejected(tmp_path):
+    path = str(tmp_path / 'old.bin')
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<8sI', b'GTMASK01', 0))
+    with pytest.raises(RuntimeError):
+        MaskStore(path)
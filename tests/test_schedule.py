@@ -0,0 +1,99 @@
+import itertools
+
+import pytest
+
+from engine import SessionConfig
+from schedule import Schedule, latin_square_row, longest_run, make_schedule
+
+
+def latin_square(n):
+    rows = 2 * n if n % 2 else n
+    return [latin_square_row(list(range(n)), row) for row in range(rows)]
+
+
+@pytest.mark.parametrize('n', [2, 3, 4, 5, 6])
+def test_latin_square_positions_balanced(n):
+    square = latin_square(n)
+    per_item = len(square) // n
+    for row in square:
+        assert sorted(row) == list(range(n))
+    for position in range(n):
+        column = [row[position] for row in square]
+        assert all(column.count(item) == per_item for item in range(n))
+
+
+@pytest.mark.parametrize('n', [2, 3, 4, 5, 6])
+def test_latin_square_successors_balanced(n):
+    square = latin_square(n)
+    pairs = [pair for row in square for pair in zip(row, row[1:])]
+    counts = set(pairs.count(pair)
+                 for pair in itertools.permutations(range(n), 2))
+    assert len(counts) == 1
+
+
+def test_longest_run():
+    assert longest_run([]) == 0
+    assert longest_run('aabbba') == 3
+    assert longest_run('abab') == 1
+
+
+def test_same_seed_same_schedule():
+    config = SessionConfig(num_trials=20)
+    first = make_schedule(config, seed=7)
+    again = make_schedule(config, seed=7)
+    other = make_schedule(config, seed=8)
+    assert first.trials == again.trials
+    assert first.trials != other.trials
+    assert sorted(t['index'] for t in first) == list(range(1, 21))
+    assert [t['trial'] for t in first] == list(range(1, 21))
+
+
+def test_config_seed_and_drawn_seed():
+    assert make_schedule(SessionConfig(num_trials=5, seed=3)).seed == 3
+    schedule = make_schedule(SessionConfig(num_trials=5))
+    assert schedule.trials == \
+        make_schedule(SessionConfig(num_trials=5), schedule.seed).trials
+
+
+def test_latin_order_follows_the_seed():
+    config = SessionConfig(num_trials=4, counterbalance='latin')
+    for seed in range(4):
+        indices = [t['index'] for t in make_schedule(config, seed)]
+        assert indices == latin_square_row([1, 2, 3, 4], seed)
+
+
+def test_search_assets():
+    config = SessionConfig(num_trials=3, shuffle=False, media_dir='m')
+    trial = make_schedule(config, 1).trials[1]
+    assert trial['index'] == 2
+    assert [p.replace('\\', '/') for p in trial['assets']] == \
+        ['m/targets/t002.jpg', 'm/stimuli/img002.jpg', 'm/gt/gt2.jpg']
+
+
+def test_max_condition_run():
+    pictures = [['a', 'a1.jpg'], ['a', 'a2.jpg'], ['a', 'a3.jpg'],
+                ['b', 'b1.jpg'], ['b', 'b2.jpg'], ['b', 'b3.jpg']]
+    config = SessionConfig(task='picture', pictures=pictures,
+                           picture_repeats=2, max_condition_run=2)
+    for seed in range(20):
+        schedule = make_schedule(config, seed)
+        assert len(schedule) == 12
+        assert longest_run(t['condition'] for t in schedule) <= 2
+
+
+def test_unknown_counterbalance():
+    with pytest.raises(ValueError):
+        make_schedule(SessionConfig(num_trials=3, counterbalance='abba'), 1)
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'schedule.json')
+    schedule = make_schedule(SessionConfig(num_trials=10), 11)
+    schedule.save(path)
+    loaded = Schedule.load(path)
+    assert loaded.task == 'search'
+    assert loaded.seed == 11
+    assert loaded.trials == schedule.trials
+    assert loaded.shared_assets == schedule.shared_assets
+    assert loaded.rules == schedule.rules
+    assert not (tmp_path / 'schedule.json.tmp').exists()
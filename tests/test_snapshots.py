@@ -0,0 +1,37 @@
+import os
+
+import pygame
+from PIL import Image
+
+from snapshots import SnapshotWriter
+
+
+def test_writes_snapshots(tmp_path):
+    writer = SnapshotWriter(max_pending=2)
+    surf = pygame.Surface((16, 8))
+    surf.fill((200, 10, 10))
+    for i in range(4):
+        writer.submit(surf, str(tmp_path / ('s%d.png' % i)))
+    writer.close()
+    assert writer.written == 4 and writer.errors == 0
+    with Image.open(str(tmp_path / 's3.png')) as img:
+        assert img.size == (16, 8)
+        assert img.getpixel((0, 0)) == (200, 10, 10)
+
+
+def test_keeps_draining_after_any_error(tmp_path, monkeypatch):
+    save = Image.Image.save
+
+    def flaky_save(self, path, *args, **kwargs):
+        if os.path.basename(path).startswith('bad'):
+            raise MemoryError()
+        return save(self, path, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, 'save', flaky_save)
+    writer = SnapshotWriter(max_pending=1)
+    surf = pygame.Surface((4, 4))
+    for name in ('bad1.png', 'ok1.png', 'bad2.png', 'ok2.png'):
+        writer.submit(surf, str(tmp_path / name))
+    writer.close()
+    assert writer.errors == 2 and writer.written == 2
+    assert writer.backlog() == 0
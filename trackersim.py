@@ -0,0 +1,548 @@
+import argparse
+import collections
+import os
+import random
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+# Local stand-in for the EyeLink Host PC
+#
+# Run this file to start a simulated tracker, then set tracker_sim in the
+# task scripts to its address. The scripts talk to it through
+# SimulatedEyeLink, a pylink.EyeLink that forwards the calls it overrides to
+# the simulator process, so every call pays a real round trip plus the
+# per-call latency the simulator is configured with.
+#
+# While recording, the simulator generates synthetic gaze (fixations on
+# random points of the screen with saccades between them). The data file
+# is written in the ASC text format of edf2asc: samples, SFIX/EFIX,
+# SSACC/ESACC, MSG lines (received time, "-<offset> message") and START/END.
+# With samples/events over the link enabled, the samples and fixation events
+# are also queued for getNextData()/getFloatData().
+
+DEFAULT_ADDRESS = ('localhost', 6000)
+AUTHKEY = b'trackersim'
+
+# per-call latency of the simulated link (in ms)
+DEFAULT_LATENCY_MS = {
+    'sendMessage': 0.5,
+    'sendCommand': 1.0,
+    'openDataFile': 20.0,
+    'closeDataFile': 20.0,
+    'startRecording': 50.0,
+    'stopRecording': 20.0,
+    'setOfflineMode': 5.0,
+    'bitmapBackdrop': 5.0,
+    'imageBackdrop': 5.0,
+    'receiveDataFile': 100.0,
+    }
+
+# transfer rate of the simulated link for bitmapBackdrop/receiveDataFile
+DEFAULT_BANDWIDTH_MBS = 10.0
+
+DEFAULT_SCREEN_SIZE = (1920, 1080)
+
+# link data types of getNextData()
+STARTFIX = 7
+ENDFIX = 8
+SAMPLE_TYPE = 200
+
+# the most samples/events the link queue holds, like the tracker, the
+# oldest ones are dropped when the client does not keep up
+LINK_QUEUE_SIZE = 10000
+
+
+class GazeModel(object):
+    """ synthetic gaze: fixations on random points with saccades between
+
+    screen_size: (width, height) of the screen in pixels
+    rng: random.Random instance to draw the fixations from
+
+    events are tuples: ('SFIX', t, x, y), ('EFIX', start, end, x, y),
+    ('SSACC', t), ('ESACC', start, end, x0, y0, x1, y1)
+    """
+
+    def __init__(self, screen_size, rng):
+        self.screen_size = screen_size
+        self.rng = rng
+        self._fix_start = None
+        self._fix_end = None
+        self._sacc_end = None
+        self._pos = self._random_point()
+        self._target = self._pos
+        self._sum = [0.0, 0.0, 0]
+
+    def _random_point(self):
+        w, h = self.screen_size
+        return (self.rng.uniform(0.1, 0.9) * w, self.rng.uniform(0.1, 0.9) * h)
+
+    def step(self, t):
+        """ advance the gaze to tracker time t (ms)
+
+        returns the (x, y, pupil) sample and a list of events
+        """
+
+        events = []
+        if self._fix_start is None and self._sacc_end is None:
+            self._start_fixation(t, events)
+        if self._sacc_end is not None:
+            if t >= self._sacc_end:
+                self._end_saccade(t, events)
+                self._start_fixation(t, events)
+            else:
+                # move linearly towards the saccade target
+                f = (t - self._sacc_start) / (self._sacc_end - self._sacc_start)
+                x = self._sacc_from[0] + f * (self._target[0] - self._sacc_from[0])
+                y = self._sacc_from[1] + f * (self._target[1] - self._sacc_from[1])
+                return (x, y, 1000.0), events
+        elif t >= self._fix_end:
+            self._end_fixation(t, events)
+            self._sacc_start = t
+            self._sacc_from = self._pos
+            self._target = self._random_point()
+            self._sacc_end = t + self.rng.randint(20, 60)
+            events.append(('SSACC', t))
+            return (self._pos[0], self._pos[1], 1000.0), events
+
+        x = self._pos[0] + self.rng.gauss(0, 2.0)
+        y = self._pos[1] + self.rng.gauss(0, 2.0)
+        self._sum[0] += x
+        self._sum[1] += y
+        self._sum[2] += 1
+        return (x, y, 1000.0 + self.rng.gauss(0, 10.0)), events
+
+    def _start_fixation(self, t, events):
+        self._fix_start = t
+        self._fix_end = t + self.rng.randint(150, 450)
+        self._sum = [0.0, 0.0, 0]
+        events.append(('SFIX', t, self._pos[0], self._pos[1]))
+
+    def _end_fixation(self, t, events):
+        n = max(1, self._sum[2])
+        events.append(('EFIX', self._fix_start, t,
+                       self._sum[0] / n, self._sum[1] / n))
+        self._fix_start = None
+
+    def _end_saccade(self, t, events):
+        events.append(('ESACC', self._sacc_start, t,
+                       self._sacc_from[0], self._sacc_from[1],
+                       self._target[0], self._target[1]))
+        self._pos = self._target
+        self._sacc_end = None
+
+    def finish(self, t):
+        """ return the events closing the current fixation/saccade """
+
+        events = []
+        if self._sacc_end is not None:
+            self._end_saccade(t, events)
+        elif self._fix_start is not None:
+            self._end_fixation(t, events)
+        return events
+
+
+def asc_line(event):
+    """ format an event of GazeModel as a line of an ASC file """
+
+    kind = event[0]
+    if kind == 'SFIX':
+        return 'SFIX R   %d' % event[1]
+    elif kind == 'EFIX':
+        start, end, x, y = event[1:]
+        return 'EFIX R   %d\t%d\t%d\t%.1f\t%.1f\t%d' % (
+            start, end, end - start, x, y, 1000)
+    elif kind == 'SSACC':
+        return 'SSACC R  %d' % event[1]
+    start, end, x0, y0, x1, y1 = event[1:]
+    return 'ESACC R  %d\t%d\t%d\t%.1f\t%.1f\t%.1f\t%.1f' % (
+        start, end, end - start, x0, y0, x1, y1)
+
+
+class TrackerSimulator(object):
+    """ the simulated Host PC, serving one SimulatedEyeLink at a time
+
+    data_dir: folder to write the data files to
+    rate: sampling rate of the synthetic gaze (in Hz)
+    latency_ms: dict of per-call latencies, see DEFAULT_LATENCY_MS
+    bandwidth: transfer rate of the link (in MB/s)
+    seed: seed of the gaze model, None for a random one
+    """
+
+    def __init__(self, data_dir, rate=500, latency_ms=None, bandwidth=None,
+                 seed=None):
+        self.data_dir = data_dir
+        self.rate = rate
+        self.latency_ms = dict(DEFAULT_LATENCY_MS)
+        if latency_ms:
+            self.latency_ms.update(latency_ms)
+        self.bandwidth = bandwidth or DEFAULT_BANDWIDTH_MBS
+        self.rng = random.Random(seed)
+        self.screen_size = DEFAULT_SCREEN_SIZE
+        self.t0 = time.perf_counter()
+        self.recording = False
+        self._data = None
+        self._data_path = None
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._link = collections.deque(maxlen=LINK_QUEUE_SIZE)
+        self._link_samples = False
+        self._link_events = False
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+
+    def tracker_time(self):
+        """ return the tracker clock (ms since the simulator started) """
+
+        return int((time.perf_counter() - self.t0) * 1000)
+
+    def _write(self, line):
+        with self._lock:
+            if self._data is not None:
+                self._data.write(line + '\n')
+
+    def _transfer(self, nbytes):
+        time.sleep(nbytes / (self.bandwidth * 1e6))
+
+    def serve(self, address=DEFAULT_ADDRESS):
+        """ accept connections and answer their calls, forever """
+
+        with Listener(address, authkey=AUTHKEY) as listener:
+            print('Tracker simulator listening on %s:%d' % address)
+            while True:
+                with listener.accept() as conn:
+                    print('Connected')
+                    self._handle(conn)
+                    print('Disconnected')
+
+    def _handle(self, conn):
+        while True:
+            try:
+                name, args = conn.recv()
+            except EOFError:
+                break
+            latency = self.latency_ms.get(name, 0.0)
+            if latency:
+                time.sleep(latency / 1000.0)
+            try:
+                result = getattr(self, 'do_' + name)(*args)
+            except Exception as err:
+                conn.send(('error', '%s: %s' % (name, err)))
+            else:
+                conn.send(('ok', result))
+            if name == 'close':
+                break
+        self.do_stopRecording()
+        self.do_closeDataFile()
+
+    # the calls of the EyeLink API, see SimulatedEyeLink
+
+    def do_openDataFile(self, name):
+        self.do_closeDataFile()
+        self._data_path = os.path.join(self.data_dir, name)
+        self._data = open(self._data_path, 'w')
+        self._write('** CONVERTED FROM %s by trackersim' % name)
+        return 0
+
+    def do_closeDataFile(self):
+        with self._lock:
+            if self._data is not None:
+                self._data.close()
+                self._data = None
+        return 0
+
+    def do_sendCommand(self, cmd):
+        if cmd.startswith('screen_pixel_coords'):
+            coords = cmd.split('=')[1].split()
+            self.screen_size = (int(float(coords[2])) + 1,
+                                int(float(coords[3])) + 1)
+        elif cmd.startswith('add_file_preamble_text'):
+            self._write('** %s' % cmd.split(' ', 1)[1].strip("'"))
+        return 0
+
+    def do_sendMessage(self, msg):
+        t = self.tracker_time()
+        # "<offset> message" is logged the way edf2asc writes it: the time
+        # it was received and the negated offset in front of the text
+        head, sep, rest = msg.partition(' ')
+        if sep and head.lstrip('-').isdigit():
+            msg = '%d %s' % (-int(head), rest)
+        self._write('MSG\t%d %s' % (t, msg))
+        return 0
+
+    def do_setOfflineMode(self):
+        self.do_stopRecording()
+        return 0
+
+    def do_startRecording(self, samples, events, link_samples, link_events):
+        if self.recording:
+            return 0
+        self.recording = True
+        self._link_samples = bool(link_samples)
+        self._link_events = bool(link_events)
+        self._link.clear()
+        t = self.tracker_time()
+        self._write('START\t%d \tRIGHT\tSAMPLES\tEVENTS' % t)
+        self._sampler = threading.Thread(target=self._sample, args=(t,),
+                                         daemon=True)
+        self._sampler.start()
+        return 0
+
+    def do_stopRecording(self):
+        if not self.recording:
+            return 0
+        self.recording = False
+        self._sampler.join()
+        self._sampler = None
+        return 0
+
+    def do_isRecording(self):
+        return self.recording
+
+    def do_getLinkData(self):
+        items = []
+        while self._link:
+            items.append(self._link.popleft())
+        return items
+
+    def do_bitmapBackdrop(self, width, height, nbytes):
+        self._transfer(nbytes)
+        return 0
+
+    def do_imageBackdrop(self, path):
+        return 0
+
+    def do_receiveDataFile(self, name):
+        self.do_closeDataFile()
+        if self._data_path is None or not os.path.exists(self._data_path):
+            raise RuntimeError('no data file')
+        with open(self._data_path, 'rb') as f:
+            data = f.read()
+        self._transfer(len(data))
+        return data
+
+    def do_close(self):
+        return 0
+
+    def _sample(self, t_start):
+        """ write synthetic samples in real time until recording stops """
+
+        model = GazeModel(self.screen_size, self.rng)
+        step = 1000.0 / self.rate
+        t = float(t_start)
+        while self.recording:
+            now = self.tracker_time()
+            lines = []
+            while t <= now:
+                (x, y, pupil), events = model.step(int(t))
+                for event in events:
+                    lines.append(asc_line(event))
+                    if self._link_events and event[0] in ('SFIX', 'EFIX'):
+                        self._link.append(event)
+                lines.append('%d\t%7.1f\t%7.1f\t%7.1f\t...' % (t, x, y, pupil))
+                if self._link_samples:
+                    self._link.append(('SAMPLE', int(t), x, y, pupil))
+                t += step
+            if lines:
+                self._write('\n'.join(lines))
+            time.sleep(0.01)
+        t_end = self.tracker_time()
+        lines = [asc_line(event) for event in model.finish(t_end)]
+        lines.append('END\t%d \tSAMPLES\tEVENTS\tRES\t1.00\t1.00' % t_end)
+        self._write('\n'.join(lines))
+
+
+class LinkData(object):
+    """ a sample or fixation event from the simulator, with the accessors
+    of the pylink Sample/StartFixationEvent/EndFixationEvent objects
+
+    item: ('SAMPLE', t, x, y, pupil), ('SFIX', t, x, y) or
+          ('EFIX', start, end, x, y)
+    """
+
+    def __init__(self, item):
+        self.item = item
+
+    # samples, always of the right eye
+
+    def getTime(self):
+        return self.item[1]
+
+    def isRightSample(self):
+        return True
+
+    def isLeftSample(self):
+        return False
+
+    def getRightEye(self):
+        return self
+
+    def getGaze(self):
+        return self.item[2], self.item[3]
+
+    def getPupilSize(self):
+        return self.item[4]
+
+    # fixation events
+
+    def getEye(self):
+        return 1
+
+    def getStartTime(self):
+        return self.item[1]
+
+    def getEndTime(self):
+        return self.item[2]
+
+    def getStartGaze(self):
+        return self.item[2], self.item[3]
+
+    def getAverageGaze(self):
+        return self.item[3], self.item[4]
+
+
+def simulated_eyelink_class():
+    """ return the SimulatedEyeLink class (pylink is only imported here) """
+
+    import pylink
+
+    class SimulatedEyeLink(pylink.EyeLink):
+        """ a pylink.EyeLink whose link calls go to a TrackerSimulator
+
+        it starts as a dummy-mode connection, so pylink.getEYELINK() and
+        the calls not listed here behave as in dummy mode
+
+        address: the (host, port) the simulator listens on
+        """
+
+        def __init__(self, address=DEFAULT_ADDRESS):
+            pylink.EyeLink.__init__(self, None)
+            try:
+                self._conn = Client(tuple(address), authkey=AUTHKEY)
+            except OSError as err:
+                raise RuntimeError('cannot reach the tracker simulator at '
+                                   '%s:%d: %s' % (address[0], address[1], err))
+            # a GazeReader thread may call in while the task is sending
+            self._lock = threading.Lock()
+            self._link_data = collections.deque()
+            self._float_data = None
+
+        def _call(self, name, *args):
+            with self._lock:
+                self._conn.send((name, args))
+                status, result = self._conn.recv()
+            if status == 'error':
+                raise RuntimeError(result)
+            return result
+
+        def openDataFile(self, name):
+            return self._call('openDataFile', name)
+
+        def closeDataFile(self):
+            return self._call('closeDataFile')
+
+        def sendCommand(self, cmd):
+            return self._call('sendCommand', cmd)
+
+        def sendMessage(self, msg):
+            return self._call('sendMessage', msg)
+
+        def setOfflineMode(self):
+            return self._call('setOfflineMode')
+
+        def startRecording(self, samples, events, link_samples, link_events):
+            return self._call('startRecording', samples, events,
+                              link_samples, link_events)
+
+        def stopRecording(self):
+            return self._call('stopRecording')
+
+        def isRecording(self):
+            if self._call('isRecording'):
+                return pylink.TRIAL_OK
+            return pylink.TRIAL_ERROR
+
+        def getNextData(self):
+            if not self._link_data:
+                self._link_data.extend(self._call('getLinkData'))
+                if not self._link_data:
+                    return 0
+            item = self._link_data.popleft()
+            self._float_data = LinkData(item)
+            return {'SAMPLE': SAMPLE_TYPE, 'SFIX': STARTFIX,
+                    'EFIX': ENDFIX}[item[0]]
+
+        def getFloatData(self):
+            return self._float_data
+
+        def isConnected(self):
+            return not self._conn.closed
+
+        def breakPressed(self):
+            return False
+
+        def doTrackerSetup(self, *args):
+            return 0
+
+        def doDriftCorrect(self, x, y, draw, allow_setup):
+            return 0
+
+        def getTrackerVersionString(self):
+            return 'EYELINK CL SIMULATED 5.0'
+
+        def bitmapBackdrop(self, width, height, pixels, *args):
+            # the pixels get packed for the link, as pylink does
+            data = bytes(v for row in pixels for pix in row for v in pix)
+            return self._call('bitmapBackdrop', width, height, len(data))
+
+        def imageBackdrop(self, path, *args):
+            return self._call('imageBackdrop', path)
+
+        def receiveDataFile(self, src, dest):
+            data = self._call('receiveDataFile', src)
+            with open(dest, 'wb') as f:
+                f.write(data)
+            return len(data)
+
+        def close(self):
+            if not self._conn.closed:
+                self._call('close')
+                self._conn.close()
+
+    return SimulatedEyeLink
+
+
+def connect(address=DEFAULT_ADDRESS):
+    """ return a SimulatedEyeLink connected to the simulator at address """
+
+    return simulated_eyelink_class()(address)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run a local EyeLink Host PC simulator')
+    parser.add_argument('--host', default=DEFAULT_ADDRESS[0],
+                        help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_ADDRESS[1],
+                        help='port to listen on')
+    parser.add_argument('--data-dir', default='sim_data',
+                        help='folder to write the data files to')
+    parser.add_argument('--rate', type=int, default=500,
+                        help='sampling rate of the synthetic gaze (Hz)')
+    parser.add_argument('--latency', action='append', default=[],
+                        metavar='CALL=MS',
+                        help='latency of a call, e.g., sendMessage=0.5')
+    parser.add_argument('--bandwidth', type=float,
+                        default=DEFAULT_BANDWIDTH_MBS,
+                        help='transfer rate of the link (MB/s)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the synthetic gaze')
+    args = parser.parse_args()
+
+    latency_ms = {}
+    for item in args.latency:
+        name, ms = item.split('=')
+        latency_ms[name] = float(ms)
+    simulator = TrackerSimulator(args.data_dir, args.rate, latency_ms,
+                                 args.bandwidth, args.seed)
+    simulator.serve((args.host, args.port))